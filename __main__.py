@@ -1,10 +1,25 @@
 ## Import packages used in this function.
+import argparse
+import sys
 from fractal_console import FractalConsole
 
 ## The main function that the user will be interacting with.
 def main():
-    console = FractalConsole()
-    console.run_program()
+    parser = argparse.ArgumentParser(description="Fractal Generator. Runs the text console when no job file is given.")
+    parser.add_argument("jobs", nargs="?", help="A JSON or YAML job file of fractal specs to render without prompts.")
+    parser.add_argument("-o", "--output", default=".", help="The output directory for batch renders.")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="The number of worker processes for batch renders.")
+    parser.add_argument("-c", "--cache", default=None, help="A render cache directory reused across batch runs.")
+    args = parser.parse_args()
+
+    if args.jobs is None:
+        console = FractalConsole()
+        console.run_program()
+    else:
+        from batch import load_jobs, run_jobs
+        results = run_jobs(load_jobs(args.jobs), args.output, args.workers, args.cache)
+        if any(result["error"] is not None for result in results):
+            sys.exit(1)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
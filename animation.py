@@ -0,0 +1,277 @@
+## Imports packages used in this module.
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from matplotlib.collections import LineCollection, PolyCollection
+from figures import figure_pixels, new_figure
+from image_writer import APNGWriter, colormap_lut, compress_image, write_png
+from mandelbrot_engine import count_dtype, escape_time
+
+## Default width and height of an animation frame in pixels.
+DEFAULT_FRAME_SIZE = (640, 480)
+
+## Default number of frames per second.
+DEFAULT_FPS = 25
+
+## Finds the samples of a previous frame that land on the pixels of a new one.
+def _match_axis(new, old, tolerance):
+    """
+    Returns the positions along an axis where a new pixel lies within tolerance of an old sample.
+
+    Args:
+        new (np.array): The increasing coordinates of the new pixels.
+        old (np.array): The increasing coordinates of the old samples.
+        tolerance (float): The largest distance at which an old sample is reused.
+
+    Returns:
+        new_index (np.array): The positions in new that reuse a sample.
+        old_index (np.array): The position in old of the sample each of them reuses.
+    """
+    right = np.clip(np.searchsorted(old, new), 1, len(old) - 1)
+    left = right - 1
+    nearest = np.where(np.abs(old[left] - new) <= np.abs(old[right] - new), left, right)
+    close = np.abs(old[nearest] - new) <= tolerance
+    return np.nonzero(close)[0], nearest[close]
+
+## Default distance, in pixels, within which a sample of the previous frame is reused (only coinciding samples).
+DEFAULT_REUSE_TOLERANCE = 0
+
+## Renders the iteration counts of a zoom sequence.
+def zoom_counts(center, width, zoom, frames, size=DEFAULT_FRAME_SIZE, num=100, threshold=2, fast_path=True,
+                backend="numpy", tolerance=DEFAULT_REUSE_TOLERANCE, metrics=None):
+    """
+    Yields the escape-time iteration counts of every frame of a zoom, reusing the previous frame.
+
+    Every frame keeps the same pixel size and center and scales the window width
+    by zoom. The samples of the previous frame are reprojected onto the new
+    pixel grid: a pixel takes the count of the nearest previous sample when that
+    sample lies within tolerance pixels of its center, and only the other pixels
+    are iterated. The true position of every sample is carried from frame to
+    frame, so a count is never shown more than tolerance pixels away from where
+    it was computed, however often it is reused, and edges move by at most
+    that much. The default of 0 only reuses exactly coinciding samples and
+    gives exact frames. A tolerance of half a pixel is an approximation to opt
+    into: a 0.9 zoom then reuses about three fifths of every frame and a 0.5
+    zoom about a quarter, at the cost of a few percent of shifted pixels.
+
+    Args:
+        center (tuple): The real and imaginary coordinates of the frame center.
+        width (float): The width of the first frame on the real axis.
+        zoom (float): The factor applied to the width from one frame to the next (below 1 zooms in).
+        frames (int): The number of frames.
+        size (tuple): The width and height of a frame in pixels.
+        num (int): The maximum number of iterations.
+        threshold (float): The escape radius.
+        fast_path (boolean): Whether to use bulb rejection and periodicity checks.
+        backend (str): The escape-time kernel, one of mandelbrot_engine.KERNELS.
+        tolerance (float): The largest distance, in pixels, at which an earlier sample is reused.
+        metrics (RenderMetrics): Receives the iteration time and the reused and computed pixels, or None.
+
+    Yields:
+        counts (np.array): Integer iteration counts with one row per imaginary value, smallest first.
+    """
+    columns, rows = size
+    previous = None
+    for frame in range(frames):
+        step = (width * (zoom ** frame)) / columns
+        real = center[0] + ((np.arange(columns) - ((columns - 1) / 2)) * step)
+        imag = center[1] + ((np.arange(rows) - ((rows - 1) / 2)) * step)
+        counts = np.empty((rows, columns), dtype=count_dtype(num))
+        missing = np.ones((rows, columns), dtype=bool)
+        sample_real = np.broadcast_to(real, (rows, columns)).copy()
+        sample_imag = np.broadcast_to(imag[:, np.newaxis], (rows, columns)).copy()
+
+        if previous is not None:
+            old_real, old_imag, old_counts, old_sample_real, old_sample_imag = previous
+            limit = tolerance * step
+            # Candidates come from the nearest previous pixel along each axis, and are kept
+            # only when the sample that pixel holds lies within the limit of the new center.
+            search = limit + (abs(old_real[-1] - old_real[0]) / max(len(old_real) - 1, 1))
+            new_cols, old_cols = _match_axis(real, old_real, search)
+            new_rows, old_rows = _match_axis(imag, old_imag, search)
+            candidate_real = old_sample_real[np.ix_(old_rows, old_cols)]
+            candidate_imag = old_sample_imag[np.ix_(old_rows, old_cols)]
+            close = (np.abs(candidate_real - real[new_cols]) <= limit) & \
+                    (np.abs(candidate_imag - imag[new_rows, np.newaxis]) <= limit)
+            row_index, col_index = np.nonzero(close)
+            target = (new_rows[row_index], new_cols[col_index])
+            counts[target] = old_counts[old_rows[row_index], old_cols[col_index]]
+            sample_real[target] = candidate_real[row_index, col_index]
+            sample_imag[target] = candidate_imag[row_index, col_index]
+            missing[target] = False
+
+        pixel_rows, pixel_cols = np.nonzero(missing)
+        if metrics is not None:
+            metrics.count("reused_pixels", counts.size - pixel_rows.size)
+            metrics.count("computed_pixels", pixel_rows.size)
+            with metrics.stage("iterate"):
+                counts[pixel_rows, pixel_cols] = escape_time(real[pixel_cols] + (imag[pixel_rows] * 1j), num,
+                                                             threshold, fast_path, backend)
+        else:
+            counts[pixel_rows, pixel_cols] = escape_time(real[pixel_cols] + (imag[pixel_rows] * 1j), num,
+                                                         threshold, fast_path, backend)
+        previous = (real, imag, counts, sample_real, sample_imag)
+        yield counts
+
+## Renders the images of a zoom sequence.
+def zoom_frames(center, width, zoom, frames, size=DEFAULT_FRAME_SIZE, num=100, threshold=2, cmap="binary",
+                colored=False, **options):
+    """
+    Yields the RGB image of every frame of a Mandelbrot zoom.
+
+    Args:
+        center (tuple): The real and imaginary coordinates of the frame center.
+        width (float): The width of the first frame on the real axis.
+        zoom (float): The factor applied to the width from one frame to the next (below 1 zooms in).
+        frames (int): The number of frames.
+        size (tuple): The width and height of a frame in pixels.
+        num (int): The maximum number of iterations.
+        threshold (float): The escape radius.
+        cmap (str): The name of the Matplotlib colormap.
+        colored (boolean): Whether iteration counts are colored instead of the binary mask.
+        **options: Further keyword arguments of zoom_counts.
+
+    Yields:
+        image (np.array): A (height, width, 3) uint8 array with the largest imaginary value in the top row.
+    """
+    lut = colormap_lut(cmap) if colored is True else colormap_lut(cmap, 2)
+    for counts in zoom_counts(center, width, zoom, frames, size, num, threshold, **options):
+        if colored is True:
+            yield lut[(counts[::-1].astype(np.int64) * (len(lut) - 1)) // max(num, 1)]
+        else:
+            yield lut[(counts[::-1] == num).view(np.uint8)]
+
+## Returns the primitives a geometric fractal draws.
+def _frame_geometry(fractal):
+    """
+    Returns the geometry of a canopy, Koch curve or Sierpinski triangle with its current parameters.
+
+    Args:
+        fractal (object): A FractalCanopy, KochCurve or SierpinskiTriangle.
+
+    Returns:
+        (np.array): An (n, 2, 2) array of segments or an (n, 3, 2) array of triangles.
+    """
+    if hasattr(fractal, "generate_branches"):
+        return fractal.generate_branches()
+    if hasattr(fractal, "generate_vertices"):
+        vertices = fractal.generate_vertices()
+        return np.stack((vertices[:-1], vertices[1:]), axis=1)
+    return fractal.generate_triangles()
+
+## Renders the images of a parameter sweep.
+def sweep_frames(fractal, attribute, values, size=DEFAULT_FRAME_SIZE, dpi=100):
+    """
+    Yields one RGB image per value of a fractal parameter, such as the branching angle of a canopy.
+
+    All frames are drawn on one headless figure whose collection is updated in
+    place, so the figure setup is paid once for the whole sweep.
+
+    Args:
+        fractal (object): A FractalCanopy, KochCurve or SierpinskiTriangle.
+        attribute (str): The attribute to sweep, one that the geometry is generated from (for example "rot_ang").
+        values (list): The value of the attribute in every frame.
+        size (tuple): The width and height of a frame in pixels.
+        dpi (int): The resolution of the figure.
+
+    Yields:
+        image (np.array): A (height, width, 3) uint8 array.
+    """
+    figure, plot = new_figure(headless=True)
+    figure.set_dpi(dpi)
+    figure.set_size_inches(size[0] / dpi, size[1] / dpi)
+    figure.subplots_adjust(0, 0, 1, 1)
+    plot.axis("off")
+    plot.set_aspect("equal")
+    collection = None
+    for value in values:
+        setattr(fractal, attribute, value)
+        geometry = _frame_geometry(fractal)
+        if collection is None and geometry.shape[1] == 2:
+            collection = plot.add_collection(LineCollection(geometry, colors="black"))
+        elif collection is None:
+            collection = plot.add_collection(PolyCollection(geometry, facecolors="black", edgecolors="none"))
+        elif geometry.shape[1] == 2:
+            collection.set_segments(geometry)
+        else:
+            collection.set_verts(geometry)
+
+        points = geometry.reshape(-1, 2)
+        if len(points) > 0:
+            low = points.min(axis=0)
+            high = points.max(axis=0)
+            margin = 0.05 * max(float(np.max(high - low)), 1e-9)
+            plot.set_xlim(low[0] - margin, high[0] + margin)
+            plot.set_ylim(low[1] - margin, high[1] + margin)
+        yield figure_pixels(figure)
+
+## Writes one numbered frame inside a worker process.
+def _write_frame(job):
+    """
+    Writes one frame of a frame directory.
+
+    Args:
+        job (tuple): The file path, image and compression level.
+
+    Returns:
+        None
+    """
+    path, image, level = job
+    write_png(path, image, level)
+
+## Streams frames into an animated PNG or a frame directory.
+def write_animation(frames, path, count, fps=DEFAULT_FPS, workers=None, level=1):
+    """
+    Encodes a sequence of frames while the next frames are still being rendered.
+
+    Frames are handed to a process pool as soon as they are produced, so the
+    encoding of one frame overlaps the rendering of the following ones. At most
+    two frames per worker are in flight, which bounds memory. When path ends in
+    .png, the workers compress the frames and they are appended in order to one
+    animated PNG; otherwise path is a directory that receives frame_00000.png,
+    frame_00001.png and so on. The animated PNG announces the number of frames
+    actually written, even when frames yields more or fewer than count.
+
+    Args:
+        frames (iterable): The (height, width) or (height, width, channels) uint8 frames.
+        path (str): The animated PNG file or the frame directory.
+        count (int): The expected number of frames.
+        fps (int): The number of frames per second of the animated PNG.
+        workers (int): The number of encoding processes (all cores when None).
+        level (int): The zlib compression level.
+
+    Returns:
+        path (str): The written file or directory.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    animated = path.lower().endswith(".png")
+    if not animated:
+        os.makedirs(path, exist_ok=True)
+
+    writer = None
+    pending = deque()
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for index, image in enumerate(frames):
+                if animated and writer is None:
+                    channels = 1 if image.ndim == 2 else image.shape[2]
+                    writer = APNGWriter(path, image.shape[1], image.shape[0], count, channels, (1, fps))
+                if animated:
+                    pending.append(pool.submit(compress_image, image, level))
+                else:
+                    frame_path = os.path.join(path, f"frame_{index:05d}.png")
+                    pending.append(pool.submit(_write_frame, (frame_path, image, level)))
+                while len(pending) > 2 * workers:
+                    data = pending.popleft().result()
+                    if animated:
+                        writer.write_frame(data)
+            while pending:
+                data = pending.popleft().result()
+                if animated:
+                    writer.write_frame(data)
+    finally:
+        if writer is not None:
+            writer.close()
+    return path
@@ -0,0 +1,141 @@
+## Imports packages used in this module.
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from canopy import FractalCanopy
+from sierpinski import SierpinskiTriangle
+from koch import KochCurve
+from mandelbrot import MandelbrotSet
+from render_cache import RenderCache
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+## The fractal class used for each job type.
+FRACTAL_TYPES = {
+    "canopy": FractalCanopy,
+    "sierpinski": SierpinskiTriangle,
+    "koch": KochCurve,
+    "mandelbrot": MandelbrotSet,
+}
+
+## Reads a job file.
+def load_jobs(path):
+    """
+    Returns the fractal specs listed in a JSON or YAML job file.
+
+    A spec is a dictionary with a "type" (canopy, sierpinski, koch or mandelbrot),
+    an optional "name", and the constructor arguments of that fractal class,
+    for example {"type": "koch", "num": 5}.
+
+    Args:
+        path (str): The path of the job file.
+
+    Returns:
+        specs (list): The fractal specs in the file.
+    """
+    with open(path) as file:
+        if path.endswith((".yaml", ".yml")):
+            if yaml is None:
+                raise ImportError("PyYAML is required to read YAML job files.")
+            specs = yaml.safe_load(file)
+        else:
+            specs = json.load(file)
+    if isinstance(specs, dict):
+        specs = specs["jobs"]
+    return specs
+
+## Builds the fractal of a spec.
+def build_fractal(spec, output_path, cache=None):
+    """
+    Returns a headless fractal instance configured from a spec.
+
+    Args:
+        spec (dict): The fractal spec.
+        output_path (str): The output directory of where the drawing is stored.
+        cache (RenderCache): The cache shared by the renders, or None.
+
+    Returns:
+        (object): One of the four fractal classes.
+    """
+    params = {key: value for key, value in spec.items() if key not in ("type", "name")}
+    for key in ("xrange", "yrange"):
+        if key in params:
+            params[key] = tuple(params[key])
+    if spec["type"] == "mandelbrot":
+        params.setdefault("scatter", False)
+    return FRACTAL_TYPES[spec["type"]](output_path=output_path, headless=True, cache=cache, **params)
+
+## Returns the deterministic file name of a job.
+def job_filename(spec, index):
+    """
+    Returns the image file name of a job, using its name or its position in the job list.
+
+    Args:
+        spec (dict): The fractal spec.
+        index (int): The position of the job in the job list.
+
+    Returns:
+        (str): The image file name.
+    """
+    return spec.get("name", f"{index:04d}_{spec['type']}") + ".png"
+
+## Renders a single job inside a worker process.
+def run_job(job):
+    """
+    Renders one job and times it.
+
+    An exception raised by the render is caught and returned as the job's
+    error, so one failing job does not stop the others.
+
+    Args:
+        job (tuple): The job index, spec, output directory and cache directory.
+
+    Returns:
+        (dict): The job's name, type, output path, render time in seconds, stage metrics and error (None on success).
+    """
+    index, spec, output_path, cache_path = job
+    start = time.perf_counter()
+    try:
+        cache = RenderCache(cache_path) if cache_path is not None else None
+        fractal = build_fractal(spec, output_path, cache)
+        path = fractal.draw_fractal(job_filename(spec, index))
+    except Exception as error:
+        return {"index": index, "type": spec.get("type"), "output": None, "seconds": time.perf_counter() - start,
+                "metrics": None, "error": f"{type(error).__name__}: {error}"}
+    return {"index": index, "type": spec["type"], "output": path, "seconds": time.perf_counter() - start,
+            "metrics": fractal.metrics.to_dict(), "error": None}
+
+## Renders a list of jobs across a process pool.
+def run_jobs(specs, output_path, workers=None, cache_path=None):
+    """
+    Renders every spec in a process pool and prints the time of each job.
+
+    Failed jobs are printed with their error as they finish and counted in a
+    summary line once every job is done.
+
+    Args:
+        specs (list): The fractal specs.
+        output_path (str): The output directory of where the drawings are stored.
+        workers (int): The number of worker processes (all cores when None).
+        cache_path (str): The render cache directory, or None to always render.
+
+    Returns:
+        results (list): The result of every job, in job order.
+    """
+    os.makedirs(output_path, exist_ok=True)
+    jobs = [(index, spec, output_path, cache_path) for index, spec in enumerate(specs)]
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for result in pool.map(run_job, jobs):
+            if result["error"] is None:
+                print(f"[{result['index'] + 1}/{len(jobs)}] {result['type']} -> {result['output']} ({result['seconds']:.3f}s)")
+            else:
+                print(f"[{result['index'] + 1}/{len(jobs)}] {result['type']} FAILED: {result['error']}")
+            results.append(result)
+    failed = sum(result["error"] is not None for result in results)
+    print(f"{len(results) - failed} of {len(results)} jobs rendered, {failed} failed.")
+    return results
@@ -0,0 +1,210 @@
+## Imports packages used in this module.
+import argparse
+import json
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+from canopy import FractalCanopy
+from sierpinski import SierpinskiTriangle
+from koch import KochCurve
+from mandelbrot import MandelbrotSet
+
+## Benchmark matrix: each case is a fractal type and its constructor parameters.
+CASES = [
+    ("canopy", {"len_ratio": 0.7, "rot_ang": 30, "num": num}) for num in (10, 14, 17)
+] + [
+    ("sierpinski", {"size": 10, "num": num}) for num in (6, 8, 10)
+] + [
+    ("koch", {"num": num}) for num in (5, 7, 9)
+] + [
+    ("mandelbrot", {"xrange": (-2, 1), "yrange": (-1.5, 1.5), "threshold": 2, "num": num, "resolution": resolution})
+    for resolution in (200, 500) for num in (100, 500)
+]
+
+## Smaller matrix for quick checks.
+QUICK_CASES = [CASES[0], CASES[3], CASES[6], CASES[9]]
+
+## Creates the fractal of a case.
+def build_case(kind, params, output_path):
+    """
+    Returns a headless fractal for a benchmark case.
+
+    Args:
+        kind (str): The fractal type.
+        params (dict): The constructor parameters.
+        output_path (str): The output directory of where the drawing is stored.
+
+    Returns:
+        (object): One of the four fractal classes.
+    """
+    if kind == "canopy":
+        return FractalCanopy(output_path=output_path, headless=True, **params)
+    if kind == "sierpinski":
+        return SierpinskiTriangle(output_path=output_path, headless=True, **params)
+    if kind == "koch":
+        return KochCurve(output_path=output_path, headless=True, **params)
+    return MandelbrotSet(scatter=False, output_path=output_path, headless=True, **params)
+
+## Stages that build the geometry (or iteration counts) of a fractal.
+GEOMETRY_STAGES = ("geometry", "complex_set", "iterate", "mask")
+
+## Stages that turn the geometry into an image.
+RENDER_STAGES = ("artists", "save")
+
+## Counters that hold the number of primitives of each fractal type.
+PRIMITIVE_COUNTS = ("segments", "triangles", "pixels")
+
+## Slowdowns of at most this many seconds are treated as timer noise.
+NOISE_FLOOR = 0.001
+
+## Times one benchmark case.
+def run_case(kind, params, output_path, repeat=3):
+    """
+    Times the geometry and render stages of one case, keeping the best of several runs.
+
+    The stage times come from the metrics each fractal records while drawing.
+    Peak memory is taken from a separate traced run, so tracing does not slow
+    down the timed runs, and is the largest peak of any geometry stage.
+
+    Args:
+        kind (str): The fractal type.
+        params (dict): The constructor parameters.
+        output_path (str): A scratch directory for the images.
+        repeat (int): The number of runs.
+
+    Returns:
+        (dict): The case with its geometry and render seconds, peak traced memory and primitive count.
+    """
+    tracemalloc.start()
+    fractal = build_case(kind, params, output_path)
+    fractal.draw_fractal(f"{kind}.png")
+    tracemalloc.stop()
+    peak = max((fractal.metrics.allocations[name]["peak_bytes"] for name in GEOMETRY_STAGES
+                if name in fractal.metrics.allocations), default=0)
+    primitives = sum(fractal.metrics.counts.get(name, 0) for name in PRIMITIVE_COUNTS)
+
+    geometry = []
+    render = []
+    for _ in range(repeat):
+        fractal = build_case(kind, params, output_path)
+        fractal.draw_fractal(f"{kind}.png")
+        stages = fractal.metrics.stages
+        geometry.append(sum(stages.get(name, 0.0) for name in GEOMETRY_STAGES))
+        render.append(sum(stages.get(name, 0.0) for name in RENDER_STAGES))
+    return {"fractal": kind, "params": params, "geometry_seconds": min(geometry),
+            "render_seconds": min(render), "peak_bytes": peak, "primitives": primitives}
+
+## Runs the whole benchmark matrix.
+def run_benchmarks(cases=CASES, repeat=3):
+    """
+    Runs every case and returns the results with details of the environment.
+
+    Args:
+        cases (list): The (fractal type, parameters) pairs to run.
+        repeat (int): The number of runs per case.
+
+    Returns:
+        (dict): The environment under "meta" and one entry per case under "results".
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as output_path:
+        for kind, params in cases:
+            result = run_case(kind, params, output_path, repeat)
+            print(f"{case_name(result):<60} geometry {result['geometry_seconds']:8.4f}s  "
+                  f"render {result['render_seconds']:8.4f}s  peak {result['peak_bytes'] / 2 ** 20:8.1f} MiB")
+            results.append(result)
+    meta = {"python": platform.python_version(), "numpy": np.__version__, "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S")}
+    return {"meta": meta, "results": results}
+
+## Names a benchmark case.
+def case_name(result):
+    """
+    Returns a readable, unique name for a benchmark case.
+
+    Args:
+        result (dict): A benchmark result or case.
+
+    Returns:
+        (str): The fractal type followed by its parameters.
+    """
+    params = ",".join(f"{key}={value}" for key, value in sorted(result["params"].items()))
+    return f"{result['fractal']}({params})"
+
+## Compares results against a baseline.
+def compare(baseline, current, tolerance=0.2, noise_floor=NOISE_FLOOR):
+    """
+    Returns the stages that got slower than the baseline by more than the tolerance.
+
+    A stage only counts as a regression when it is also slower by more than
+    noise_floor seconds, so sub-millisecond stages do not fail on timer jitter.
+
+    Args:
+        baseline (dict): Saved benchmark results.
+        current (dict): New benchmark results.
+        tolerance (float): The allowed relative slowdown, 0.2 meaning 20%.
+        noise_floor (float): The largest slowdown in seconds that is ignored.
+
+    Returns:
+        regressions (list): (case name, stage, baseline seconds, current seconds) tuples.
+    """
+    saved = {case_name(result): result for result in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        name = case_name(result)
+        if name not in saved:
+            continue
+        for stage in ("geometry_seconds", "render_seconds"):
+            before = saved[name][stage]
+            after = result[stage]
+            marker = ""
+            if after > before * (1 + tolerance) and after - before > noise_floor:
+                regressions.append((name, stage, before, after))
+                marker = "  REGRESSION"
+            print(f"{name:<60} {stage:<17} {before:8.4f}s -> {after:8.4f}s{marker}")
+    return regressions
+
+## Command-line entry point.
+def main(argv=None):
+    """
+    Runs the benchmark command line.
+
+    Args:
+        argv (list): The command-line arguments, sys.argv when None.
+
+    Returns:
+        (int): The exit status, 1 when regressions were found.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the fractal renderers.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("run", help="Run the benchmark matrix and save the results as JSON.")
+    run.add_argument("-o", "--output", default="benchmark_results.json", help="The JSON file to write.")
+    run.add_argument("-r", "--repeat", type=int, default=3, help="The number of runs per case (the best is kept).")
+    run.add_argument("--quick", action="store_true", help="Run a smaller matrix.")
+    check = commands.add_parser("compare", help="Compare results against a saved baseline.")
+    check.add_argument("baseline", help="The baseline JSON file.")
+    check.add_argument("current", help="The JSON file to check.")
+    check.add_argument("-t", "--tolerance", type=float, default=0.2, help="The allowed relative slowdown.")
+    check.add_argument("-n", "--noise-floor", type=float, default=NOISE_FLOOR,
+                       help="The largest slowdown in seconds that is ignored.")
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        results = run_benchmarks(QUICK_CASES if args.quick else CASES, args.repeat)
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+        return 0
+
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    with open(args.current) as file:
+        current = json.load(file)
+    regressions = compare(baseline, current, args.tolerance, args.noise_floor)
+    print(f"{len(regressions)} regression(s) found.")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
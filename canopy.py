@@ -1,8 +1,11 @@
 ## Imports packages used in this class.
 import os
-import time
 import numpy as np
-import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection
+from figures import new_figure, output_timestamp, save_figure
+from fractal_rules import IFS, UNIT_SEGMENT, branch_map, segment_maps
+from geometry_stream import DEFAULT_CHUNK_SIZE
+from metrics import RenderMetrics
 
 ## Represents a Tree Fractal class.
 class FractalCanopy():
@@ -18,6 +21,11 @@ class FractalCanopy():
         len_ratio (float): The cutoff ratio of the branch.
         rot_ang (float): The angle of the splitted branch.
         num (int): The number of iterations of fractal.
+        headless (boolean): Whether the fractal is rendered without pyplot or an interactive window.
+        cache (RenderCache): The cache of rendered images, or None.
+        metrics (RenderMetrics): The stage timings and counts of the last render.
+        metrics_log (str): A file that receives one JSON line of metrics per render, or None.
+        figure (Figure): The figure holding the plot.
         plot (pyplot): The plot where the fractal is drawn.
         ouptut_path (str): The output directory of where the drawing is stored.
 
@@ -25,13 +33,18 @@ class FractalCanopy():
         find_x_end(self, x, length, angle): Finds the end of x-coordinate.
         find_y_end(self, y, length, angle): Finds the end of y-coordinate.
         create_fractal(self, x, y, length, angle, iter): Creates and plots fractal given parameters.
-        draw_fractal(self): Draws and saves fractal using the parameters in class.
+        rule(self): Returns the maps that place the two child branches at the tip of a branch.
+        root_map(self): Returns the map that sends the unit segment onto the trunk.
+        generate_branches(self): Returns the start and end points of every branch.
+        iter_branches(self, chunk_size, min_size): Yields the start and end points of the branches in chunks.
+        parameters(self): Returns the parameters that determine the rendered fractal.
+        draw_fractal(self, filename): Draws and saves fractal using the parameters in class.
 
     Usage:
         This class is used to define and draw a Tree Fractal.
     """
   
-  def __init__(self, len_ratio, rot_ang, num, output_path):
+  def __init__(self, len_ratio, rot_ang, num, output_path, headless=False, cache=None, metrics_log=None):
     """
     Initializes the Tree Fractal.
 
@@ -40,6 +53,9 @@ class FractalCanopy():
         rot_ang (float): The angle of the splitted branch.
         num (int): The number of iterations of fractal.
         ouptut_path (str): The output directory of where the drawing is stored.
+        headless (boolean): Whether the fractal is rendered without pyplot or an interactive window.
+        cache (RenderCache): The cache of rendered images, or None.
+        metrics_log (str): A file that receives one JSON line of metrics per render, or None.
 
     Returns:
         None
@@ -51,7 +67,11 @@ class FractalCanopy():
     self.len_ratio = len_ratio
     self.rot_ang = rot_ang
     self.num = num
-    _, self.plot = plt.subplots()
+    self.headless = headless
+    self.cache = cache
+    self.metrics = RenderMetrics()
+    self.metrics_log = metrics_log
+    self.figure, self.plot = new_figure(headless)
     self.output_path = output_path
 
   def find_x_end(self, x, length, angle):
@@ -108,23 +128,106 @@ class FractalCanopy():
       self.create_fractal(x_end, y_end, length * self.len_ratio, angle + self.rot_ang, iter - 1)
       self.create_fractal(x_end, y_end, length * self.len_ratio, angle - self.rot_ang, iter - 1)
 
-  def draw_fractal(self):
+  def rule(self):
     """
-    Draws and saves fractal given class.
+    Returns the maps that place the two child branches at the tip of a branch.
 
     Args:
         None
 
     Returns:
+        (IFS): The maps of the left and right child, relative to the unit segment.
+    """
+    return IFS([branch_map(self.rot_ang, self.len_ratio), branch_map(-self.rot_ang, self.len_ratio)])
+
+  def root_map(self):
+    """
+    Returns the map that sends the unit segment onto the trunk.
+
+    Args:
         None
+
+    Returns:
+        (np.array): A (2, 3) affine map.
     """
-    self.create_fractal(self.x, self.y, self.length, self.angle, self.num)
-    self.plot.set_title(f'Fractal Canopy with {self.num} Iterations')
-    self.plot.axis('off')
-    timestamp = time.strftime("%Y%m%d%H%M%S")
-    filename = "TreeCanopy_" + timestamp + ".png"
-    final_output_path = os.path.join(self.output_path, filename)
-    plt.savefig(final_output_path)
-    plt.show()
+    trunk = [[self.x, self.y], [self.find_x_end(self.x, self.length, self.angle),
+                                self.find_y_end(self.y, self.length, self.angle)]]
+    return segment_maps([trunk])[0]
+
+  def generate_branches(self):
+    """
+    Returns the start and end points of every branch, composing the maps of one generation at a time.
 
-    
\ No newline at end of file
+    Args:
+        None
+
+    Returns:
+        segments (np.array): A (2^num - 1, 2, 2) array of branch start and end points.
+    """
+    if self.num <= 0:
+      return np.empty((0, 2, 2))
+    return self.rule().expand(UNIT_SEGMENT, self.num - 1, self.root_map(), keep_all=True)
+
+  def iter_branches(self, chunk_size=DEFAULT_CHUNK_SIZE, min_size=0.0):
+    """
+    Yields the start and end points of the branches in chunks of siblings, parents before children, without recursion.
+
+    Memory stays bounded by chunk_size and num however many branches there are,
+    so the branches can be written out while they are generated.
+
+    Args:
+        chunk_size (int): The largest number of branches in one chunk.
+        min_size (float): The size below which the branches above a branch are left out, 0 for every branch.
+
+    Yields:
+        segments (np.array): An (n, 2, 2) array of branch start and end points.
+    """
+    yield from self.rule().iter_expand(UNIT_SEGMENT, self.num - 1, self.root_map(), True, chunk_size, min_size)
+
+  def parameters(self):
+    """
+    Returns the parameters that determine the rendered fractal.
+
+    Args:
+        None
+
+    Returns:
+        (dict): The length ratio, branching angle and number of iterations.
+    """
+    return {"len_ratio": self.len_ratio, "rot_ang": self.rot_ang, "num": self.num}
+
+  def draw_fractal(self, filename=None):
+    """
+    Draws and saves fractal given class.
+
+    Args:
+        filename (str): The image file name, a timestamped name when None.
+
+    Returns:
+        final_output_path (str): The path of the saved image.
+    """
+    self.metrics = RenderMetrics()
+    if filename is None:
+      timestamp = output_timestamp()
+      filename = "TreeCanopy_" + timestamp + ".png"
+    final_output_path = os.path.join(self.output_path, filename)
+    with self.metrics.stage("cache"):
+      cached = self.cache is not None and self.cache.fetch_image("FractalCanopy.image", self.parameters(), final_output_path)
+    if cached:
+      self.metrics.count("cache_hits", 1)
+    else:
+      with self.metrics.stage("geometry"):
+        segments = self.generate_branches()
+      self.metrics.count("segments", len(segments))
+      with self.metrics.stage("artists"):
+        self.plot.add_collection(LineCollection(segments, colors = 'black'))
+        self.plot.autoscale_view()
+        self.plot.set_title(f'Fractal Canopy with {self.num} Iterations')
+        self.plot.axis('off')
+      with self.metrics.stage("save"):
+        save_figure(self.figure, final_output_path, self.headless)
+      if self.cache is not None:
+        self.cache.store_image("FractalCanopy.image", self.parameters(), final_output_path)
+    if self.metrics_log is not None:
+      self.metrics.write_log(self.metrics_log, fractal="FractalCanopy", params=self.parameters(), output=final_output_path)
+    return final_output_path
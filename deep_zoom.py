@@ -0,0 +1,176 @@
+## Imports packages used in this module.
+from decimal import Decimal, localcontext
+import numpy as np
+
+## Decimal digits kept beyond those needed to tell two pixels apart.
+GUARD_DIGITS = 20
+
+## Converts a window bound to an exact decimal.
+def to_decimal(value):
+    """
+    Returns a window bound as a Decimal, keeping strings exact.
+
+    Args:
+        value (str, float or Decimal): The bound, a string for more digits than float64 holds.
+
+    Returns:
+        (Decimal): The bound.
+    """
+    if isinstance(value, Decimal):
+        return value
+    return Decimal(str(value)) if not isinstance(value, str) else Decimal(value)
+
+## Returns the digits needed to resolve a window.
+def required_precision(xrange, yrange):
+    """
+    Returns the number of decimal digits needed to resolve pixels in a window.
+
+    Args:
+        xrange (tuple): The range of the real numbers.
+        yrange (tuple): The range of the imaginary numbers.
+
+    Returns:
+        (int): The decimal precision of the reference orbit.
+    """
+    xmin, xmax = map(to_decimal, xrange)
+    ymin, ymax = map(to_decimal, yrange)
+    span = min(xmax - xmin, ymax - ymin)
+    return max(30, -span.adjusted() + GUARD_DIGITS)
+
+## Computes the pixel offsets of a deep-zoom window.
+def delta_axes(xrange, yrange, resolution):
+    """
+    Returns the window center and the float64 offsets of every pixel from it.
+
+    Offsets stay accurate at any zoom because they are relative to the center,
+    while the window bounds themselves may need more digits than float64 holds.
+
+    Args:
+        xrange (tuple): The range of the real numbers.
+        yrange (tuple): The range of the imaginary numbers.
+        resolution (float): The number of pixels per unit length.
+
+    Returns:
+        center (tuple): The real and imaginary part of the center as Decimals.
+        dx (np.array): The real offset of every pixel column.
+        dy (np.array): The imaginary offset of every pixel row.
+    """
+    with localcontext() as context:
+        context.prec = required_precision(xrange, yrange)
+        xmin, xmax = map(to_decimal, xrange)
+        ymin, ymax = map(to_decimal, yrange)
+        resolution = to_decimal(resolution)
+        center = ((xmin + xmax) / 2, (ymin + ymax) / 2)
+        dx = np.linspace(float(xmin - center[0]), float(xmax - center[0]), int((xmax - xmin) * resolution))
+        dy = np.linspace(float(ymin - center[1]), float(ymax - center[1]), int((ymax - ymin) * resolution))
+    return center, dx, dy
+
+## Iterates the high precision reference orbit.
+def reference_orbit(center, num, threshold, precision):
+    """
+    Returns the orbit of the window center, iterated in decimal arithmetic.
+
+    Args:
+        center (tuple): The real and imaginary part of the center as Decimals.
+        num (int): The maximum number of iterations.
+        threshold (float): The escape radius.
+        precision (int): The number of decimal digits used.
+
+    Returns:
+        orbit (np.array): Z_0 = 0 up to Z_num (or the first escaped value) as complex128.
+    """
+    orbit = [0j]
+    with localcontext() as context:
+        context.prec = precision
+        cx, cy = center
+        x = Decimal(0)
+        y = Decimal(0)
+        threshold_sq = to_decimal(threshold) ** 2
+        for _ in range(num):
+            x, y = (x * x) - (y * y) + cx, (2 * x * y) + cy
+            orbit.append(complex(float(x), float(y)))
+            if (x * x) + (y * y) > threshold_sq:
+                break
+    return np.array(orbit, dtype=np.complex128)
+
+## Escape-time iteration of pixel offsets around a reference orbit.
+def perturbation_escape_time(dc, orbit, num, threshold):
+    """
+    Returns the escape-time iteration counts of pixels given as offsets from a reference orbit.
+
+    Every pixel iterates dz = 2 * Z * dz + dz**2 + dc in float64 next to the
+    reference orbit Z. A pixel whose full value Z + dz becomes smaller than dz
+    would lose its precision (a glitch), so it is rebased: dz takes the full
+    value and the pixel restarts from the beginning of the reference orbit.
+    Pixels that reach the end of the reference orbit are rebased the same way.
+
+    Args:
+        dc (np.array): The offsets of the pixels from the reference point.
+        orbit (np.array): The reference orbit from reference_orbit.
+        num (int): The maximum number of iterations.
+        threshold (float): The escape radius.
+
+    Returns:
+        counts (np.array): Integer iteration counts shaped like dc, equal to num for points that never escape.
+    """
+    counts = np.full(dc.shape, num, dtype=np.int32)
+    flat_counts = counts.reshape(-1)
+    dc_active = dc.reshape(-1).copy()
+    index = np.arange(dc_active.size)
+    dz = np.zeros_like(dc_active)
+    step = np.zeros(dc_active.size, dtype=np.intp)
+    last = len(orbit) - 1
+    threshold_sq = float(threshold) ** 2
+
+    for i in range(num):
+        if index.size == 0:
+            break
+        reference = orbit[step]
+        reference *= 2
+        reference += dz
+        dz *= reference
+        dz += dc_active
+        step += 1
+        full = orbit[step]
+        full += dz
+        full_sq = (full.real * full.real) + (full.imag * full.imag)
+        escaped = full_sq > threshold_sq
+
+        rebase = full_sq < (dz.real * dz.real) + (dz.imag * dz.imag)
+        rebase |= step == last
+        if rebase.any():
+            dz[rebase] = full[rebase]
+            step[rebase] = 0
+
+        if escaped.any():
+            flat_counts[index[escaped]] = i
+            active = ~escaped
+            dz = dz[active]
+            dc_active = dc_active[active]
+            step = step[active]
+            index = index[active]
+
+    return counts
+
+## Renders a deep-zoom window.
+def perturbation_counts(xrange, yrange, resolution, num, threshold):
+    """
+    Returns the iteration counts of a window too small for float64 coordinates.
+
+    One reference orbit is computed in decimal arithmetic at the window center,
+    and every pixel is iterated as a float64 offset from it.
+
+    Args:
+        xrange (tuple): The range of the real numbers (strings or Decimals keep every digit).
+        yrange (tuple): The range of the imaginary numbers (strings or Decimals keep every digit).
+        resolution (float): The number of pixels per unit length.
+        num (int): The maximum number of iterations.
+        threshold (float): The escape radius.
+
+    Returns:
+        counts (np.array): Integer iteration counts with one row per imaginary value.
+    """
+    center, dx, dy = delta_axes(xrange, yrange, resolution)
+    orbit = reference_orbit(center, num, threshold, required_precision(xrange, yrange))
+    dc = dx[np.newaxis, :] + (dy[:, np.newaxis] * 1j)
+    return perturbation_escape_time(dc, orbit, num, threshold)
@@ -0,0 +1,74 @@
+## Imports packages used in this module.
+from datetime import datetime
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+## Names output files after the time they were written.
+def output_timestamp():
+    """
+    Returns the current time down to the microsecond, so files written in the same second get different names.
+
+    Args:
+        None
+
+    Returns:
+        (str): The time as YYYYmmdd-HHMMSS-ffffff.
+    """
+    return datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+
+## Creates the figure a fractal is drawn on.
+def new_figure(headless=False):
+    """
+    Returns a new figure and its plot.
+
+    Headless figures are drawn by the non-interactive Agg canvas and are never
+    registered with pyplot, so they do not touch global pyplot state and are
+    freed as soon as the fractal drops them.
+
+    Args:
+        headless (boolean): Whether the figure is rendered without pyplot.
+
+    Returns:
+        figure (Figure): The figure holding the plot.
+        plot (Axes): The plot where the fractal is drawn.
+    """
+    if headless:
+        figure = Figure()
+        FigureCanvasAgg(figure)
+        return figure, figure.add_subplot()
+    return plt.subplots()
+
+## Saves a finished fractal figure.
+def save_figure(figure, path, headless=False):
+    """
+    Saves a figure to path and shows it when running interactively.
+
+    Args:
+        figure (Figure): The figure holding the drawn fractal.
+        path (str): The image file to write.
+        headless (boolean): Whether the figure was created headless.
+
+    Returns:
+        None
+    """
+    figure.savefig(path)
+    if headless:
+        figure.clear()
+    else:
+        plt.show()
+
+## Renders a figure into a pixel array.
+def figure_pixels(figure):
+    """
+    Draws a headless figure and returns its pixels.
+
+    Args:
+        figure (Figure): A figure created with new_figure(headless=True).
+
+    Returns:
+        (np.array): A (height, width, 3) uint8 RGB array.
+    """
+    figure.canvas.draw()
+    return np.asarray(figure.canvas.buffer_rgba())[:, :, :3].copy()
@@ -0,0 +1,470 @@
+## Imports packages used in this module.
+import numpy as np
+from geometry_stream import DEFAULT_CHUNK_SIZE, stream_tree
+
+## Default number of independent walkers of the chaos game.
+DEFAULT_WALKERS = 4096
+
+## Default number of chaos game steps discarded while the walkers settle on the attractor.
+DEFAULT_BURN_IN = 20
+
+## Unit segment that edge-rewriting rules map onto their children.
+UNIT_SEGMENT = np.array([[0.0, 0.0], [1.0, 0.0]])
+
+## Composes batches of affine maps.
+def compose(outer, inner):
+    """
+    Returns every outer map composed with every inner map, outer major.
+
+    Maps are (2, 3) matrices [A | b] that send x to A x + b.
+
+    Args:
+        outer (np.array): An (n, 2, 3) array of maps applied last.
+        inner (np.array): A (k, 2, 3) array of maps applied first.
+
+    Returns:
+        (np.array): An (n * k, 2, 3) array where row i * k + j is outer[i] after inner[j].
+    """
+    # One matrix product of every outer row with all inner maps in homogeneous form.
+    homogeneous = np.zeros((len(inner), 3, 3))
+    homogeneous[:, :2] = inner
+    homogeneous[:, 2, 2] = 1.0
+    composed = outer.reshape(-1, 3) @ homogeneous.transpose(1, 0, 2).reshape(3, -1)
+    return composed.reshape(len(outer), 2, len(inner), 3).transpose(0, 2, 1, 3).reshape(-1, 2, 3)
+
+## Applies a batch of affine maps to a shape.
+def apply_maps(maps, shape):
+    """
+    Returns a shape transformed by every given map.
+
+    Args:
+        maps (np.array): An (n, 2, 3) array of maps.
+        shape (np.array): An (m, 2) array of points.
+
+    Returns:
+        (np.array): An (n, m, 2) array of transformed points.
+    """
+    homogeneous = np.column_stack((shape, np.ones(len(shape))))
+    points = maps.reshape(-1, 3) @ homogeneous.T
+    return points.reshape(len(maps), 2, len(shape)).transpose(0, 2, 1)
+
+## Builds the similarity maps that send the unit segment onto given segments.
+def segment_maps(segments):
+    """
+    Returns the maps that send the unit segment from (0, 0) to (1, 0) onto each given segment.
+
+    Args:
+        segments (np.array): An (n, 2, 2) array of segment start and end points.
+
+    Returns:
+        (np.array): An (n, 2, 3) array of rotations with scaling and translation.
+    """
+    segments = np.asarray(segments, dtype=float).reshape(-1, 2, 2)
+    dx = segments[:, 1, 0] - segments[:, 0, 0]
+    dy = segments[:, 1, 1] - segments[:, 0, 1]
+    maps = np.empty((len(segments), 2, 3))
+    maps[:, 0] = np.column_stack((dx, -dy, segments[:, 0, 0]))
+    maps[:, 1] = np.column_stack((dy, dx, segments[:, 0, 1]))
+    return maps
+
+## Measures how much affine maps stretch.
+def map_scale(maps):
+    """
+    Returns the largest factor by which each map stretches a distance.
+
+    Args:
+        maps (np.array): An (n, 2, 3) array of maps.
+
+    Returns:
+        (np.array): The spectral norm of the linear part of every map.
+    """
+    linear = maps[:, :, :2].reshape(-1, 4)
+    squares = np.sum(linear ** 2, axis=1)
+    determinant = (linear[:, 0] * linear[:, 3]) - (linear[:, 1] * linear[:, 2])
+    return np.sqrt((squares + np.sqrt(np.maximum((squares ** 2) - (4 * (determinant ** 2)), 0))) / 2)
+
+## Builds the map of a child branch.
+def branch_map(angle, ratio):
+    """
+    Returns the map that places a child branch at the tip of the unit segment.
+
+    Args:
+        angle (float): The turn of the child relative to its parent, in degrees.
+        ratio (float): The length of the child relative to its parent.
+
+    Returns:
+        (np.array): A (2, 3) map.
+    """
+    radians = np.radians(angle)
+    return np.array([[ratio * np.cos(radians), -ratio * np.sin(radians), 1.0],
+                     [ratio * np.sin(radians), ratio * np.cos(radians), 0.0]])
+
+## Represents an iterated function system.
+class IFS():
+    """
+    A class that represents an iterated function system: a set of affine maps
+    whose repeated application to a shape draws a fractal. The maps of a level
+    are composed for the whole level at once, and the attractor can also be
+    sampled point by point with the chaos game.
+
+    Attributes:
+        maps (np.array): The (k, 2, 3) affine maps [A | b].
+        probabilities (np.array): The chance of picking each map in the chaos game.
+
+    Methods:
+        transforms(self, num, root, keep_all): Returns the composed maps of a level or of every level.
+        expand(self, shape, num, root, keep_all): Returns the shape transformed by every composed map.
+        iter_expand(self, shape, num, root, keep_all, chunk_size, min_size): Yields the transformed shapes in chunks.
+        chaos_game(self, points, seed, walkers, burn_in): Returns points sampled from the attractor.
+
+    Usage:
+        This class generates the geometry of self-similar fractals.
+    """
+
+    def __init__(self, maps, probabilities=None):
+        """
+        Initializes the Iterated Function System.
+
+        Args:
+            maps (list): The affine maps as (2, 3) matrices [A | b], or as (3, 3) homogeneous matrices.
+            probabilities (list): The chance of picking each map in the chaos game, in proportion to
+                the area each map keeps when None.
+
+        Returns:
+            None
+        """
+        self.maps = np.asarray(maps, dtype=float)[:, :2, :3]
+        if probabilities is None:
+            probabilities = np.maximum(np.abs(np.linalg.det(self.maps[:, :, :2])), 1e-3)
+        probabilities = np.asarray(probabilities, dtype=float)
+        self.probabilities = probabilities / probabilities.sum()
+
+    def transforms(self, num, root=None, keep_all=False):
+        """
+        Returns the maps composed num times, one level at a time.
+
+        Args:
+            num (int): The number of levels.
+            root (np.array): A (2, 3) map applied after all others, the identity when None.
+            keep_all (boolean): Whether the composed maps of every level from 0 to num are returned.
+
+        Returns:
+            (np.array): The (k^num, 2, 3) composed maps, or those of every level one after another.
+        """
+        level = np.array([root if root is not None else np.eye(2, 3)], dtype=float)
+        levels = [level]
+        for _ in range(num):
+            level = compose(level, self.maps)
+            levels.append(level)
+        return np.concatenate(levels) if keep_all else level
+
+    def expand(self, shape, num, root=None, keep_all=False):
+        """
+        Returns a shape transformed by every map composed num times.
+
+        Args:
+            shape (np.array): An (m, 2) array of points, such as a segment or a triangle.
+            num (int): The number of levels.
+            root (np.array): A (2, 3) map applied after all others, the identity when None.
+            keep_all (boolean): Whether the shapes of every level from 0 to num are returned.
+
+        Returns:
+            (np.array): An (n, m, 2) array of transformed shapes.
+        """
+        shape = np.asarray(shape, dtype=float)
+        if keep_all or num == 0:
+            return np.ascontiguousarray(apply_maps(self.transforms(num, root, keep_all), shape))
+        # The last level transforms the children of the shape rather than composing the largest level.
+        children = apply_maps(self.maps, shape).reshape(-1, 2)
+        return apply_maps(self.transforms(num - 1, root), children).reshape(-1, len(shape), 2)
+
+    def iter_expand(self, shape, num, root=None, keep_all=False, chunk_size=DEFAULT_CHUNK_SIZE, min_size=0.0):
+        """
+        Yields the shapes of expand depth first and in chunks, so memory does not grow with their number.
+
+        With a min_size, shapes stop being subdivided once they are smaller than
+        it. When only the last level is yielded, such a shape takes the place of
+        its descendants, in order; when every level is yielded, its descendants
+        are dropped as soon as all of them together would fit within min_size.
+        The number of shapes then follows the visible detail rather than k^num.
+
+        Args:
+            shape (np.array): An (m, 2) array of points.
+            num (int): The number of levels.
+            root (np.array): A (2, 3) map applied after all others, the identity when None.
+            keep_all (boolean): Whether the shapes of every level are yielded, or only the last level.
+            chunk_size (int): The largest number of shapes in one chunk.
+            min_size (float): The size below which shapes are not subdivided, 0 to subdivide all.
+
+        Yields:
+            (np.array): An (n, m, 2) array of transformed shapes.
+        """
+        shape = np.asarray(shape, dtype=float)
+        start = np.array([root if root is not None else np.eye(2, 3)], dtype=float)
+        expand = lambda nodes: compose(nodes, self.maps)
+        if min_size > 0:
+            diameter = np.max(np.linalg.norm(shape[:, np.newaxis] - shape[np.newaxis], axis=2))
+            if keep_all:
+                # Descendants of a shape reach at most c + c^2 + ... of its size for contraction c.
+                contraction = np.max(map_scale(self.maps))
+                diameter *= (contraction / (1 - contraction)) if contraction < 1 else np.inf
+            expand = lambda nodes: self._expand_visible(nodes, min_size / diameter, keep_all)
+        for maps in stream_tree(start, expand, num, chunk_size, not keep_all):
+            yield np.ascontiguousarray(apply_maps(maps, shape))
+
+    def _expand_visible(self, nodes, min_scale, keep_all):
+        """
+        Returns the children of the nodes whose scale is at least min_scale.
+
+        Args:
+            nodes (np.array): An (n, 2, 3) array of composed maps.
+            min_scale (float): The smallest scale that is still subdivided.
+            keep_all (boolean): Whether smaller nodes are dropped, or kept in place of their children.
+
+        Returns:
+            (np.array): The children, in order.
+        """
+        visible = map_scale(nodes) >= min_scale
+        children = compose(nodes[visible], self.maps)
+        if keep_all or visible.all():
+            return children
+        counts = np.where(visible, len(self.maps), 1)
+        offsets = np.cumsum(counts) - counts
+        expanded = np.empty((counts.sum(), 2, 3))
+        expanded[(offsets[visible, np.newaxis] + np.arange(len(self.maps))).ravel()] = children
+        expanded[offsets[~visible]] = nodes[~visible]
+        return expanded
+
+    def chaos_game(self, points, seed=None, walkers=DEFAULT_WALKERS, burn_in=DEFAULT_BURN_IN):
+        """
+        Returns points sampled from the attractor by the chaos game.
+
+        Many walkers are moved at once: every step picks a random map for each
+        walker and applies it, so one step is a handful of array operations. The
+        first burn_in steps are discarded while the walkers settle on the attractor.
+
+        Args:
+            points (int): The number of points to return.
+            seed (int): The seed of the random generator, or None.
+            walkers (int): The number of walkers moved together.
+            burn_in (int): The number of steps discarded at the start.
+
+        Returns:
+            (np.array): A (points, 2) array of points.
+        """
+        generator = np.random.default_rng(seed)
+        walkers = max(1, min(walkers, points))
+        position = generator.random((walkers, 2))
+        steps = -(-points // walkers)
+        samples = np.empty((steps, walkers, 2))
+        for step in range(burn_in + steps):
+            chosen = self.maps[generator.choice(len(self.maps), size=walkers, p=self.probabilities)]
+            position = np.matmul(chosen[:, :, :2], position[:, :, np.newaxis])[..., 0] + chosen[:, :, 2]
+            if step >= burn_in:
+                samples[step - burn_in] = position
+        return samples.reshape(-1, 2)[:points]
+
+## Represents a Lindenmayer system.
+class LSystem():
+    """
+    A class that represents a Lindenmayer system: an axiom and productions that
+    rewrite every symbol at once, read by a turtle. The turtle draws a segment
+    for every drawing symbol, moves without drawing for "f", turns by the angle
+    for "+" (counterclockwise) and "-", turns around for "|", and saves and
+    restores its state with "[" and "]". All other symbols are ignored.
+
+    The turtle is vectorized: headings are the cumulative sum of the turns and
+    positions the cumulative sum of the steps, with every "]" given the turn
+    and step that undoes its bracket.
+
+    Attributes:
+        axiom (str): The starting string.
+        rules (dict): The productions by symbol.
+        angle (float): The turning angle in degrees.
+        heading (float): The starting heading in degrees.
+        draw (str): The symbols that draw a segment.
+
+    Methods:
+        expand(self, num): Returns the string after num rewrites.
+        segments(self, num, step, start): Returns the segments the turtle draws.
+        compile(self): Returns the maps of an edge-rewriting system.
+
+    Usage:
+        This class generates the geometry of curves and plants given by rewriting rules.
+    """
+
+    def __init__(self, axiom, rules, angle, heading=0.0, draw="FG"):
+        """
+        Initializes the Lindenmayer System.
+
+        Args:
+            axiom (str): The starting string.
+            rules (dict): The productions by symbol, for example {"F": "F+F--F+F"}.
+            angle (float): The turning angle in degrees.
+            heading (float): The starting heading in degrees.
+            draw (str): The symbols that draw a segment.
+
+        Returns:
+            None
+        """
+        self.axiom = axiom
+        self.rules = rules
+        self.angle = angle
+        self.heading = heading
+        self.draw = draw
+
+    def expand(self, num):
+        """
+        Returns the string after rewriting every symbol num times.
+
+        Args:
+            num (int): The number of rewrites.
+
+        Returns:
+            (str): The expanded string.
+        """
+        table = str.maketrans(self.rules)
+        commands = self.axiom
+        for _ in range(num):
+            commands = commands.translate(table)
+        return commands
+
+    def segments(self, num, step=1.0, start=(0.0, 0.0)):
+        """
+        Returns the segments the turtle draws for the string after num rewrites.
+
+        Args:
+            num (int): The number of rewrites.
+            step (float): The length of one step.
+            start (tuple): The starting position.
+
+        Returns:
+            (np.array): An (n, 2, 2) array of segment start and end points in drawing order.
+        """
+        symbols = np.frombuffer(self.expand(num).encode("latin-1"), dtype=np.uint8)
+        turns = np.zeros(symbols.size)
+        turns[symbols == ord("+")] = self.angle
+        turns[symbols == ord("-")] = -self.angle
+        turns[symbols == ord("|")] = 180.0
+        drawing = np.isin(symbols, np.frombuffer(self.draw.encode("latin-1"), dtype=np.uint8))
+        moving = drawing | (symbols == ord("f"))
+
+        brackets = _match_brackets(symbols)
+        radians = np.radians(self.heading + _restore_cumsum(turns, brackets))
+        moves = np.zeros((symbols.size, 2))
+        moves[moving, 0] = step * np.cos(radians[moving])
+        moves[moving, 1] = step * np.sin(radians[moving])
+        ends = np.asarray(start, dtype=float) + _restore_cumsum(moves, brackets)
+        return np.stack((ends[drawing] - moves[drawing], ends[drawing]), axis=1)
+
+    def compile(self):
+        """
+        Returns the maps of an edge-rewriting system, where one drawing symbol is replaced by a path of itself.
+
+        Every copy of the symbol in the production becomes the similarity map
+        that sends the unit segment onto that copy, scaled so the production
+        runs from (0, 0) to (1, 0). Expanding the unit segment with the maps
+        then gives the same segments as the turtle, without building the string.
+
+        Args:
+            None
+
+        Returns:
+            (IFS): The maps of the production, in drawing order.
+        """
+        symbol, production = next(iter(self.rules.items()), (None, ""))
+        if len(self.rules) != 1 or symbol not in self.draw:
+            raise ValueError("Only systems with a single production for a drawing symbol compile to maps.")
+        if set(production) - {symbol, "+", "-", "|"}:
+            raise ValueError("Only productions made of the drawing symbol and turns compile to maps.")
+        children = LSystem(production, {}, self.angle, 0.0, symbol).segments(0)
+        if len(children) == 0 or not np.any(children[-1, 1]):
+            raise ValueError("The production must not end where it starts.")
+        normalize = segment_maps([[[0.0, 0.0], children[-1, 1]]])[0]
+        normalize = np.linalg.inv(np.vstack((normalize, [0.0, 0.0, 1.0])))[:2]
+        return IFS(compose(normalize[np.newaxis], segment_maps(children)))
+
+## Pairs the brackets of a turtle string.
+def _match_brackets(symbols):
+    """
+    Returns the matching "[" and "]" positions of a turtle string and the pair that encloses each pair.
+
+    Pairs are matched without a Python loop: sorted by nesting depth and then
+    by position, the k-th "[" and the k-th "]" of a depth belong together, and
+    the enclosing pair is the last "[" one level up before the pair's "[".
+
+    Args:
+        symbols (np.array): The string as uint8 codes.
+
+    Returns:
+        opens (np.array): The position of the "[" of every pair.
+        closes (np.array): The position of the "]" of every pair.
+        parents (np.array): The index of the enclosing pair of every pair, or -1.
+    """
+    is_open = symbols == ord("[")
+    is_close = symbols == ord("]")
+    depth = np.cumsum(is_open.astype(np.int64) - is_close)
+    opens = np.nonzero(is_open)[0]
+    closes = np.nonzero(is_close)[0]
+    if opens.size != closes.size or (depth.size > 0 and depth.min() < 0):
+        raise ValueError("The brackets of the string are not balanced.")
+    open_depth = depth[opens]
+    close_depth = depth[closes] + 1
+    open_order = np.lexsort((opens, open_depth))
+    opens = opens[open_order]
+    open_depth = open_depth[open_order]
+    closes = closes[np.lexsort((closes, close_depth))]
+
+    keys = (open_depth * (symbols.size + 1)) + opens
+    parents = np.searchsorted(keys, ((open_depth - 1) * (symbols.size + 1)) + opens) - 1
+    parents[open_depth == 1] = -1
+    return opens, closes, parents
+
+## Cumulative sum where every "]" undoes its bracket.
+def _restore_cumsum(increments, brackets):
+    """
+    Returns the cumulative sum of per-symbol increments, restored at the end of every bracket.
+
+    Every "]" is given the increment that cancels what its bracket added,
+    leaving out what nested brackets already cancelled themselves.
+
+    Args:
+        increments (np.array): The change caused by every symbol, with one row per symbol.
+        brackets (tuple): The opens, closes and parents from _match_brackets.
+
+    Returns:
+        (np.array): The running total after every symbol.
+    """
+    opens, closes, parents = brackets
+    total = np.cumsum(increments, axis=0)
+    if opens.size == 0:
+        return total
+    inside = total[closes] - total[opens]
+    correction = -inside
+    nested = parents >= 0
+    np.add.at(correction, parents[nested], inside[nested])
+    increments = increments.copy()
+    increments[closes] += correction
+    return np.cumsum(increments, axis=0)
+
+## Koch curve: every segment becomes four with a spike in the middle.
+KOCH_CURVE = LSystem("F", {"F": "F+F--F+F"}, 60)
+
+## Lévy C curve.
+LEVY_C_CURVE = LSystem("F", {"F": "+F--F+"}, 45)
+
+## Heighway dragon curve.
+DRAGON_CURVE = LSystem("FX", {"X": "X+YF+", "Y": "-FX-Y"}, 90)
+
+## Hilbert curve.
+HILBERT_CURVE = LSystem("A", {"A": "+BF-AFA-FB+", "B": "-AF+BFB-FA-"}, 90)
+
+## Fractal plant with branches.
+FRACTAL_PLANT = LSystem("X", {"X": "F+[[X]-X]-F[-FX]+X", "F": "FF"}, 25, heading=60)
+
+## Barnsley fern.
+BARNSLEY_FERN = IFS([[[0.0, 0.0, 0.0], [0.0, 0.16, 0.0]],
+                     [[0.85, 0.04, 0.0], [-0.04, 0.85, 1.6]],
+                     [[0.2, -0.26, 0.0], [0.23, 0.22, 1.6]],
+                     [[-0.15, 0.28, 0.0], [0.26, 0.24, 0.44]]],
+                    [0.01, 0.85, 0.07, 0.07])
@@ -0,0 +1,45 @@
+## Default maximum number of primitives in one streamed chunk.
+DEFAULT_CHUNK_SIZE = 65536
+
+## Walks a subdivision tree with an explicit stack, one chunk of nodes at a time.
+def stream_tree(roots, expand, depth, chunk_size=DEFAULT_CHUNK_SIZE, leaves_only=True):
+    """
+    Yields the nodes of a subdivision tree in chunks, using an explicit stack instead of recursion.
+
+    Every node is one row of a 2D array. expand turns a batch of nodes into the
+    batch of their children, keeping siblings next to each other in order. A
+    batch larger than chunk_size is split before it is expanded, so the stack
+    holds at most a few chunks per level and memory does not grow with the
+    total number of nodes. Leaves come out in the order a recursive depth-first
+    walk would reach them. With leaves_only set to False, a chunk holds
+    siblings of one level and comes out before the chunks of their children,
+    so inner nodes follow the tree level by level within each subtree rather
+    than in strict pre-order.
+
+    Args:
+        roots (np.array): The nodes at level 0, one per row.
+        expand (function): Returns the children of a batch of nodes, one per row.
+        depth (int): The level of the leaves.
+        chunk_size (int): The largest number of nodes yielded at once.
+        leaves_only (boolean): Whether only the leaves are yielded, or every level.
+
+    Yields:
+        nodes (np.array): A chunk of at most chunk_size nodes.
+    """
+    if depth < 0 or len(roots) == 0:
+        return
+    stack = [(roots, 0)]
+    while stack:
+        nodes, level = stack.pop()
+        if len(nodes) == 0:
+            continue
+        if len(nodes) > chunk_size:
+            starts = range(0, len(nodes), chunk_size)
+            stack.extend((nodes[start:start + chunk_size], level) for start in reversed(starts))
+            continue
+        if level == depth:
+            yield nodes
+            continue
+        if not leaves_only:
+            yield nodes
+        stack.append((expand(nodes), level + 1))
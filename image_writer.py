@@ -0,0 +1,380 @@
+## Imports packages used in this module.
+import struct
+import zlib
+import numpy as np
+import matplotlib
+
+## PNG color types keyed by the number of channels per pixel.
+PNG_COLOR_TYPES = {1: 0, 3: 2, 4: 6}
+
+## Signature at the start of every PNG file.
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+## Packs one PNG chunk.
+def png_chunk(kind, data):
+    """
+    Returns one PNG chunk with its length and checksum.
+
+    Args:
+        kind (bytes): The four letter chunk type.
+        data (bytes): The chunk payload.
+
+    Returns:
+        (bytes): The encoded chunk.
+    """
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+## Packs the header chunk of a PNG image.
+def png_header(width, height, channels):
+    """
+    Returns the IHDR chunk of an 8-bit image.
+
+    Args:
+        width (int): The width of the image in pixels.
+        height (int): The height of the image in pixels.
+        channels (int): The number of channels per pixel (1, 3 or 4).
+
+    Returns:
+        (bytes): The encoded chunk.
+    """
+    return png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, PNG_COLOR_TYPES[channels], 0, 0, 0))
+
+## Builds a colormap lookup table.
+def colormap_lut(cmap="binary", size=256):
+    """
+    Returns a lookup table of RGB colors sampled from a Matplotlib colormap.
+
+    Args:
+        cmap (str): The name of the Matplotlib colormap.
+        size (int): The number of colors in the table.
+
+    Returns:
+        lut (np.array): A (size, 3) uint8 array of RGB colors.
+    """
+    colors = matplotlib.colormaps[cmap](np.linspace(0, 1, size))[:, :3]
+    return np.round(colors * 255).astype(np.uint8)
+
+## Maps normalized values through a lookup table.
+def apply_lut(values, lut):
+    """
+    Returns the colors of given values between 0 and 1.
+
+    Args:
+        values (np.array): Values between 0 and 1 (any shape).
+        lut (np.array): A (size, 3) uint8 lookup table.
+
+    Returns:
+        (np.array): A uint8 array shaped like values with an extra channel axis.
+    """
+    index = np.clip(values, 0, 1) * (len(lut) - 1)
+    return lut[index.astype(np.intp)]
+
+## Default number of histogram bins of an equalized palette.
+DEFAULT_EQUALIZE_BINS = 4096
+
+## Builds a histogram-equalization curve.
+def equalization_curve(values, bins=DEFAULT_EQUALIZE_BINS):
+    """
+    Returns a curve that spreads values between 0 and 1 evenly over a palette.
+
+    The curve is the cumulative histogram of the values below 1 (values of 1,
+    such as points inside the Mandelbrot Set, are left out), so colors are
+    spent where most pixels are rather than where the values are spread out.
+    np.histogram works through the values in blocks, so no full-size copy is made.
+
+    Args:
+        values (np.array): Values between 0 and 1 (any shape).
+        bins (int): The number of histogram bins.
+
+    Returns:
+        edges (np.array): The bin edges, from 0 to 1.
+        curve (np.array): The equalized value at every edge, from 0 to 1.
+    """
+    histogram, edges = np.histogram(values, bins=bins, range=(0, 1))
+    histogram[-1] -= np.count_nonzero(values >= 1)
+    curve = np.concatenate(([0.0], np.cumsum(histogram, dtype=np.float64)))
+    return edges, curve / max(curve[-1], 1)
+
+## Colors a band of normalized values.
+def colorize(values, lut, curve=None, interior=(0, 0, 0)):
+    """
+    Returns the colors of values between 0 and 1, with values of 1 in the interior color.
+
+    Args:
+        values (np.array): Values between 0 and 1 (any shape).
+        lut (np.array): A (size, 3) uint8 lookup table.
+        curve (tuple): The edges and curve from equalization_curve, or None to use the values as they are.
+        interior (tuple): The RGB color of values of 1.
+
+    Returns:
+        (np.array): A uint8 array shaped like values with an extra channel axis.
+    """
+    levels = np.interp(values, curve[0], curve[1]) if curve is not None else values
+    image = apply_lut(levels, lut)
+    image[values >= 1] = interior
+    return image
+
+## Streams colored values into a PNG file.
+def write_colored_png(path, values, lut, curve=None, interior=(0, 0, 0), level=1, band_rows=256):
+    """
+    Colors values band by band and writes each band to a PNG file as soon as it is colored.
+
+    Only one band of colors exists at a time. The last row of values becomes
+    the top row of the image, as the rows of a fractal grid grow upwards.
+
+    Args:
+        path (str): The PNG file to write.
+        values (np.array): A (height, width) array of values between 0 and 1.
+        lut (np.array): A (size, 3) uint8 lookup table.
+        curve (tuple): The edges and curve from equalization_curve, or None.
+        interior (tuple): The RGB color of values of 1.
+        level (int): The zlib compression level.
+        band_rows (int): The number of rows colored at once.
+
+    Returns:
+        None
+    """
+    flipped = values[::-1]
+    with PNGWriter(path, values.shape[1], values.shape[0], 3, level) as writer:
+        for r0 in range(0, values.shape[0], band_rows):
+            writer.write_rows(colorize(flipped[r0:r0 + band_rows], lut, curve, interior))
+
+## Streams pixel rows into a PNG file.
+class PNGWriter():
+    """
+    A class that writes a PNG file one band of rows at a time. Rows are
+    compressed as they arrive, so the whole image never has to be in memory.
+
+    Attributes:
+        width (int): The width of the image in pixels.
+        height (int): The height of the image in pixels.
+        channels (int): The number of channels per pixel (1, 3 or 4).
+        rows_written (int): The number of rows written so far.
+        file (file): The open output file.
+        compressor (zlib.Compress): The compressor of the image data stream.
+
+    Methods:
+        write_rows(self, rows): Appends a band of rows to the image.
+        close(self): Finishes and closes the PNG file.
+
+    Usage:
+        This class is used to write images at native resolution without Matplotlib figures.
+    """
+
+    def __init__(self, path, width, height, channels=3, level=1):
+        """
+        Opens the PNG file and writes its header.
+
+        Args:
+            path (str): The PNG file to write.
+            width (int): The width of the image in pixels.
+            height (int): The height of the image in pixels.
+            channels (int): The number of channels per pixel (1, 3 or 4).
+            level (int): The zlib compression level.
+
+        Returns:
+            None
+        """
+        self.width = width
+        self.height = height
+        self.channels = channels
+        self.rows_written = 0
+        self.file = open(path, "wb")
+        self.compressor = zlib.compressobj(level)
+        self.file.write(PNG_SIGNATURE)
+        self.file.write(png_header(width, height, channels))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _write_chunk(self, kind, data):
+        """
+        Writes one PNG chunk.
+
+        Args:
+            kind (bytes): The four letter chunk type.
+            data (bytes): The chunk payload.
+
+        Returns:
+            None
+        """
+        self.file.write(png_chunk(kind, data))
+
+    def write_rows(self, rows):
+        """
+        Appends a band of rows to the image.
+
+        Args:
+            rows (np.array): A uint8 array of shape (n, width) or (n, width, channels).
+
+        Returns:
+            None
+        """
+        rows = np.asarray(rows, dtype=np.uint8).reshape(-1, self.width * self.channels)
+        scanlines = np.zeros((rows.shape[0], rows.shape[1] + 1), dtype=np.uint8)
+        scanlines[:, 1:] = rows
+        data = self.compressor.compress(scanlines.tobytes())
+        if data:
+            self._write_chunk(b"IDAT", data)
+        self.rows_written += rows.shape[0]
+
+    def close(self):
+        """
+        Finishes and closes the PNG file.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        if self.file.closed:
+            return
+        self._write_chunk(b"IDAT", self.compressor.flush())
+        self._write_chunk(b"IEND", b"")
+        self.file.close()
+
+## Compresses a whole image into PNG image data.
+def compress_image(image, level=1):
+    """
+    Returns the zlib stream of an image's scanlines, ready to be stored in IDAT or fdAT chunks.
+
+    Args:
+        image (np.array): A uint8 array of shape (height, width) or (height, width, channels).
+        level (int): The zlib compression level.
+
+    Returns:
+        (bytes): The compressed scanlines.
+    """
+    image = np.asarray(image, dtype=np.uint8)
+    rows = image.reshape(image.shape[0], -1)
+    scanlines = np.zeros((rows.shape[0], rows.shape[1] + 1), dtype=np.uint8)
+    scanlines[:, 1:] = rows
+    return zlib.compress(scanlines.tobytes(), level)
+
+## Writes animation frames into an animated PNG file.
+class APNGWriter(PNGWriter):
+    """
+    A class that writes an animated PNG one frame at a time. Frames are passed
+    in already compressed (see compress_image), so the compression can run
+    elsewhere while this class only appends the chunks in order. Viewers
+    without APNG support show the first frame.
+
+    Attributes:
+        frames (int): The number of frames announced in the header, corrected on close to the number written.
+        frames_written (int): The number of frames written so far.
+        delay (tuple): The numerator and denominator of every frame's duration in seconds.
+        plays (int): The number of times the animation loops, 0 for forever.
+        header_offset (int): The file position of the animation header.
+        sequence (int): The sequence number of the next animation chunk.
+
+    Methods:
+        write_frame(self, data): Appends one compressed frame.
+        close(self): Finishes and closes the file.
+
+    Usage:
+        This class is used by the animation renderer to stream frames into one image.
+    """
+
+    def __init__(self, path, width, height, frames, channels=3, delay=(1, 25), plays=0):
+        """
+        Opens the file and writes the PNG and animation headers.
+
+        Args:
+            path (str): The PNG file to write.
+            width (int): The width of every frame in pixels.
+            height (int): The height of every frame in pixels.
+            frames (int): The number of frames expected, rewritten on close if a different number was written.
+            channels (int): The number of channels per pixel (1, 3 or 4).
+            delay (tuple): The numerator and denominator of every frame's duration in seconds.
+            plays (int): The number of times the animation loops, 0 for forever.
+
+        Returns:
+            None
+        """
+        super().__init__(path, width, height, channels)
+        self.frames = frames
+        self.frames_written = 0
+        self.delay = delay
+        self.plays = plays
+        self.sequence = 0
+        self.header_offset = self.file.tell()
+        self._write_chunk(b"acTL", struct.pack(">II", frames, plays))
+
+    def write_frame(self, data):
+        """
+        Appends one frame.
+
+        Args:
+            data (bytes): The frame compressed by compress_image.
+
+        Returns:
+            None
+        """
+        self._write_chunk(b"fcTL", struct.pack(">IIIIIHHBB", self.sequence, self.width, self.height, 0, 0,
+                                               self.delay[0], self.delay[1], 0, 0))
+        self.sequence += 1
+        if self.frames_written == 0:
+            self._write_chunk(b"IDAT", data)
+        else:
+            self._write_chunk(b"fdAT", struct.pack(">I", self.sequence) + data)
+            self.sequence += 1
+        self.frames_written += 1
+
+    def close(self):
+        """
+        Finishes and closes the file.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        if self.file.closed:
+            return
+        self._write_chunk(b"IEND", b"")
+        if self.frames_written != self.frames:
+            # The header was written before the frames, so it is rewritten in place with the real count.
+            self.frames = self.frames_written
+            self.file.seek(self.header_offset)
+            self._write_chunk(b"acTL", struct.pack(">II", self.frames, self.plays))
+        self.file.close()
+
+## Encodes a whole image as PNG bytes.
+def encode_png(image, level=1):
+    """
+    Returns an image encoded as a PNG file in memory.
+
+    Args:
+        image (np.array): A uint8 array of shape (height, width) or (height, width, channels).
+        level (int): The zlib compression level.
+
+    Returns:
+        (bytes): The PNG file.
+    """
+    channels = 1 if image.ndim == 2 else image.shape[2]
+    return (PNG_SIGNATURE + png_header(image.shape[1], image.shape[0], channels)
+            + png_chunk(b"IDAT", compress_image(image, level)) + png_chunk(b"IEND", b""))
+
+## Writes a whole image to a PNG file.
+def write_png(path, image, level=1, band_rows=256):
+    """
+    Writes an image array to a PNG file at its native resolution.
+
+    Args:
+        path (str): The PNG file to write.
+        image (np.array): A uint8 array of shape (height, width) or (height, width, channels).
+        level (int): The zlib compression level.
+        band_rows (int): The number of rows compressed at once.
+
+    Returns:
+        None
+    """
+    channels = 1 if image.ndim == 2 else image.shape[2]
+    with PNGWriter(path, image.shape[1], image.shape[0], channels, level) as writer:
+        for r0 in range(0, image.shape[0], band_rows):
+            writer.write_rows(image[r0:r0 + band_rows])
@@ -1,8 +1,14 @@
 ## Imports packages used in this class.
 import os
-import time
 import numpy as np
-import matplotlib.pyplot as plt
+from figures import new_figure, output_timestamp, save_figure
+from fractal_rules import IFS, UNIT_SEGMENT, segment_maps
+from geometry_stream import DEFAULT_CHUNK_SIZE
+from metrics import RenderMetrics
+
+## The curve's rule: the unit segment becomes four with a spike a third of the segment tall.
+KOCH_SPIKE = np.array([[0, 0], [1 / 3, 0], [1 / 2, 1 / 3], [2 / 3, 0], [1, 0]])
+KOCH_RULE = IFS(segment_maps(np.stack((KOCH_SPIKE[:-1], KOCH_SPIKE[1:]), axis=1)))
 
 ## Represents a Koch Curve class.
 class KochCurve():
@@ -14,6 +20,11 @@ class KochCurve():
         coord1 (tuple): The starting coordinates of curve.
         coord2 (tuple): The ending coordinates of curve.
         num (int): The number of iterations of fractal.
+        headless (boolean): Whether the fractal is rendered without pyplot or an interactive window.
+        cache (RenderCache): The cache of rendered images, or None.
+        metrics (RenderMetrics): The stage timings and counts of the last render.
+        metrics_log (str): A file that receives one JSON line of metrics per render, or None.
+        figure (Figure): The figure holding the plot.
         plot (pyplot): The plot where the fractal is drawn.
         ouptut_path (str): The output directory of where the drawing is stored.
 
@@ -23,19 +34,26 @@ class KochCurve():
         find_tri_point_end(self, coord1, coord2): Finds the ending coordinates of triangle.
         find_tri_point_mid(self, coord1, coord2): Finds the coordinates of triangle's tip.
         create_fractal(self, x, y, length, angle, iter): Creates and plots fractal given parameters.
-        draw_fractal(self): Draws and saves fractal using the parameters in class.
+        root_map(self): Returns the map that sends the unit segment onto the curve's first segment.
+        generate_vertices(self): Returns every vertex of the curve as one array.
+        iter_segments(self, chunk_size, min_size): Yields the segments of the curve in chunks.
+        parameters(self): Returns the parameters that determine the rendered fractal.
+        draw_fractal(self, filename): Draws and saves fractal using the parameters in class.
 
     Usage:
         This class is used to define and draw a Koch Curve Fractal.
     """
   
-  def __init__(self, num, output_path):
+  def __init__(self, num, output_path, headless=False, cache=None, metrics_log=None):
     """
     Initializes the Koch Curve Fractal.
 
     Args:
         num (int): The number of iterations of fractal.
         ouptut_path (str): The output directory of where the drawing is stored.
+        headless (boolean): Whether the fractal is rendered without pyplot or an interactive window.
+        cache (RenderCache): The cache of rendered images, or None.
+        metrics_log (str): A file that receives one JSON line of metrics per render, or None.
 
     Returns:
         None
@@ -43,7 +61,11 @@ class KochCurve():
     self.coord1 = (0, 0)
     self.coord2 = (10, 0)
     self.num = num
-    _, self.plot = plt.subplots()
+    self.headless = headless
+    self.cache = cache
+    self.metrics = RenderMetrics()
+    self.metrics_log = metrics_log
+    self.figure, self.plot = new_figure(headless)
     self.output_path = output_path
 
   def find_midpoint(self, coord1, coord2):
@@ -130,22 +152,92 @@ class KochCurve():
       self.create_fractal(coord5, coord4, iter - 1)
       self.create_fractal(coord4, coord2, iter - 1)
 
-  def draw_fractal(self):
+  def root_map(self):
     """
-    Draws and saves fractal given class.
+    Returns the map that sends the unit segment onto the curve's first segment.
 
     Args:
         None
 
     Returns:
+        (np.array): A (2, 3) affine map.
+    """
+    return segment_maps([[self.coord1, self.coord2]])[0]
+
+  def generate_vertices(self):
+    """
+    Returns every vertex of the curve, composing the maps of a whole level at once.
+
+    Args:
         None
+
+    Returns:
+        vertices (np.array): An (4^num + 1, 2) array of the curve's vertices in drawing order.
     """
-    self.create_fractal(self.coord1, self.coord2, self.num)
-    plt.gca().set_aspect("equal")
-    self.plot.set_title(f'Koch Curve with {self.num} Iterations')
-    self.plot.axis('off')
-    timestamp = time.strftime("%Y%m%d%H%M%S")
-    filename = "KochCurve_" + timestamp + ".png"
+    segments = KOCH_RULE.expand(UNIT_SEGMENT, self.num, self.root_map())
+    vertices = np.concatenate((segments[:, 0], segments[-1:, 1]))
+    return vertices
+
+  def iter_segments(self, chunk_size=DEFAULT_CHUNK_SIZE, min_size=0.0):
+    """
+    Yields the segments of the curve in drawing order and in chunks, without recursion.
+
+    Memory stays bounded by chunk_size and num however many segments there are,
+    so the curve can be written out while it is generated.
+
+    Args:
+        chunk_size (int): The largest number of segments in one chunk.
+        min_size (float): The length below which a segment stands in for its part of the curve, 0 for the full curve.
+
+    Yields:
+        segments (np.array): An (n, 2, 2) array of segment start and end points.
+    """
+    yield from KOCH_RULE.iter_expand(UNIT_SEGMENT, self.num, self.root_map(), False, chunk_size, min_size)
+
+  def parameters(self):
+    """
+    Returns the parameters that determine the rendered fractal.
+
+    Args:
+        None
+
+    Returns:
+        (dict): The number of iterations.
+    """
+    return {"num": self.num}
+
+  def draw_fractal(self, filename=None):
+    """
+    Draws and saves fractal given class.
+
+    Args:
+        filename (str): The image file name, a timestamped name when None.
+
+    Returns:
+        final_output_path (str): The path of the saved image.
+    """
+    self.metrics = RenderMetrics()
+    if filename is None:
+      timestamp = output_timestamp()
+      filename = "KochCurve_" + timestamp + ".png"
     final_output_path = os.path.join(self.output_path, filename)
-    plt.savefig(final_output_path)
-    plt.show()
\ No newline at end of file
+    with self.metrics.stage("cache"):
+      cached = self.cache is not None and self.cache.fetch_image("KochCurve.image", self.parameters(), final_output_path)
+    if cached:
+      self.metrics.count("cache_hits", 1)
+    else:
+      with self.metrics.stage("geometry"):
+        vertices = self.generate_vertices()
+      self.metrics.count("segments", len(vertices) - 1)
+      with self.metrics.stage("artists"):
+        self.plot.plot(vertices[:, 0], vertices[:, 1], color = 'black')
+        self.plot.set_aspect("equal")
+        self.plot.set_title(f'Koch Curve with {self.num} Iterations')
+        self.plot.axis('off')
+      with self.metrics.stage("save"):
+        save_figure(self.figure, final_output_path, self.headless)
+      if self.cache is not None:
+        self.cache.store_image("KochCurve.image", self.parameters(), final_output_path)
+    if self.metrics_log is not None:
+      self.metrics.write_log(self.metrics_log, fractal="KochCurve", params=self.parameters(), output=final_output_path)
+    return final_output_path
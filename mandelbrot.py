@@ -1,10 +1,15 @@
 ## Import packages used in this class.
 import os
-import time
 import numpy as np
-import matplotlib.pyplot as plt
-import warnings
-warnings.filterwarnings("ignore")
+from deep_zoom import GUARD_DIGITS, delta_axes, perturbation_counts
+from figures import new_figure, output_timestamp, save_figure
+from image_writer import colorize, colormap_lut, equalization_curve, write_colored_png, write_png
+from mandelbrot_engine import (PRECISIONS, complex_dtype, count_dtype, escape_time, escape_time_state, grid_axes,
+                               select_precision, smooth_escape_time)
+from mariani_silver import mariani_silver_counts
+from mandelbrot_progressive import DEFAULT_LEVELS, progressive_counts
+from mandelbrot_tiles import DEFAULT_BAND_ROWS, DEFAULT_TILE_SIZE, render_bands, render_tiled
+from metrics import RenderMetrics
 
 ## Represents a Mandelbrot Fractal class.
 class MandelbrotSet():
@@ -17,23 +22,52 @@ class MandelbrotSet():
         yrange (tuple): The range of the imaginary numbers.
         complex_set (np.array): An array full of complex numbers within the range of xrange and yrange.
         mandelbrot_set (np.array): An array full of complex numbers that satisfy Mandelbrot's condition.
+        iterations (np.array): The escape-time iteration count of every complex number in complex set.
+        state (EscapeState): The checkpoint of the last single-process render, used to resume deeper renders.
         threshold (float): The cutoff threshold for Mandelbrot Set.
         num (int): The number of iterations of fractal.
         resolution (int): The number of pixels (complex numbers) generated.
         is_scatter (boolean): Whether the plot is scattered or binary.
+        fast_path (boolean): Whether interior points are classified by bulb and periodicity checks.
+        workers (int): The number of processes used to render tiles (all cores when None).
+        tile_size (int): The edge length of a render tile when rendering with several processes.
+        strategy (str): How the grid is rendered, "grid" for every pixel, "mariani_silver" for rectangle
+            subdivision or "perturbation" for deep zooms.
+        backend (str): The escape-time kernel, "numpy", "inplace" or "jit" (when Numba is installed).
+        headless (boolean): Whether the fractal is rendered without pyplot or an interactive window.
+        cache (RenderCache): The cache of iteration counts and images, or None.
+        figure (Figure): The figure holding the plot.
         plot (pyplot): The plot where the fractal is drawn.
         ouptut_path (str): The output directory of where the drawing is stored.
+        precision (str): The precision of the kernel, "double", "single" or "auto".
+        packed_mask (np.array): The membership mask of the last render, packed eight pixels per byte.
+        smooth (np.array): The normalized continuous iteration counts, once generate_smooth has run.
+        metrics (RenderMetrics): The stage timings and counts of the last render.
+        metrics_log (str): A file that receives one JSON line of metrics per render, or None.
 
     Methods:
+        grid_axes(self): Returns the real and imaginary axes of the pixel grid.
+        select_precision(self): Returns the precision the fractal is rendered at.
         generate_complex_set(self): Generates an array of complex numbers within range.
+        escape_time(self, c): Returns the number of iterations before given complex numbers escape.
         is_mandelbrot(self, c): Determines whether given complex number is in Mandelbrot Set.
         generate_mandelbrot_set(self): Returns an array full of complex numbers within Mandelbrot Set.
-        draw_fractal(self): Draws and saves fractal using the parameters in class.
+        refine(self, num): Deepens the last render to num iterations, reusing its state.
+        collect_mandelbrot_set(self): Collects the complex numbers within Mandelbrot Set from the iteration counts.
+        unpack_mask(self): Returns the packed membership mask as a boolean array.
+        generate_progressive(self, levels, adaptive): Yields coarse to fine previews of the iteration counts.
+        stream_to_disk(self, band_rows): Renders iteration counts to a memory-mapped file band by band.
+        generate_smooth(self, band_rows): Returns the normalized continuous iteration counts.
+        save_image(self, cmap, colored, raw, smooth, equalize): Saves the fractal as an image at its native resolution.
+        parameters(self): Returns the parameters that determine the rendered fractal.
+        draw_fractal(self, filename): Draws and saves fractal using the parameters in class.
 
     Usage:
         This class is used to define and draw a Mandelbrot Fractal.
     """
-  def __init__(self, xrange, yrange, threshold, num, resolution, scatter, output_path):
+  def __init__(self, xrange, yrange, threshold, num, resolution, scatter, output_path, fast_path=True,
+               workers=1, tile_size=DEFAULT_TILE_SIZE, headless=False, cache=None, strategy="grid",
+               backend="numpy", metrics_log=None, precision="double"):
     """
     Initializes the Mandelbrot Fractal.
 
@@ -45,6 +79,17 @@ class MandelbrotSet():
         resolution (int): The number of pixels (complex numbers) generated.
         is_scatter (boolean): Whether the plot is scattered or binary.
         ouptut_path (str): The output directory of where the drawing is stored.
+        fast_path (boolean): Whether interior points are classified by bulb and periodicity checks.
+        workers (int): The number of processes used to render tiles (all cores when None).
+        tile_size (int): The edge length of a render tile when rendering with several processes.
+        headless (boolean): Whether the fractal is rendered without pyplot or an interactive window.
+        cache (RenderCache): The cache of iteration counts and images, or None.
+        strategy (str): How the grid is rendered, "grid" for every pixel, "mariani_silver" for rectangle
+            subdivision or "perturbation" for deep zooms. Deep zoom ranges may be given as strings or Decimals.
+        backend (str): The escape-time kernel, "numpy", "inplace" or "jit" (when Numba is installed).
+        metrics_log (str): A file that receives one JSON line of metrics per render, or None.
+        precision (str): "double" iterates in float64. "single" iterates in float32 and keeps uint16 iteration
+            counts, a packed mask and no array of member points. "auto" picks "single" for wide views.
 
     Returns:
         None
@@ -53,13 +98,59 @@ class MandelbrotSet():
     self.yrange = yrange
     self.complex_set = None
     self.mandelbrot_set = None
+    self.iterations = None
+    self.state = None
     self.threshold = threshold
     self.num = num
     self.resolution = resolution
     self.is_scatter = scatter
-    _, self.plot = plt.subplots()
+    self.fast_path = fast_path
+    self.workers = workers
+    self.tile_size = tile_size
+    self.strategy = strategy
+    self.backend = backend
+    self.precision = precision
+    self.packed_mask = None
+    self.smooth = None
+    self.headless = headless
+    self.cache = cache
+    self.metrics = RenderMetrics()
+    self.metrics_log = metrics_log
+    self.figure, self.plot = new_figure(headless)
     self.output_path = output_path
   
+  def grid_axes(self):
+    """
+    Returns the real and imaginary axes of the pixel grid.
+
+    Args:
+        None
+
+    Returns:
+        real (np.array): The real part of every pixel column.
+        imag (np.array): The imaginary part of every pixel row.
+    """
+    if self.strategy == "perturbation":
+      center, dx, dy = delta_axes(self.xrange, self.yrange, self.resolution)
+      return float(center[0]) + dx, float(center[1]) + dy
+    return grid_axes(self.xrange, self.yrange, self.resolution)
+
+  def select_precision(self):
+    """
+    Returns the precision the fractal is rendered at, resolving "auto" from the zoom width and depth.
+
+    Args:
+        None
+
+    Returns:
+        (str): "single" or "double".
+    """
+    if self.strategy == "perturbation":
+      return "double"
+    if self.precision == "auto":
+      return select_precision(self.xrange, self.yrange, self.resolution, self.num)
+    return self.precision
+
   def generate_complex_set(self):
     """
     Generates an array of complex numbers within range.
@@ -70,12 +161,24 @@ class MandelbrotSet():
     Returns:
         None: Updates self.complex_set
     """
-    xmin, xmax = self.xrange
-    ymin, ymax = self.yrange
-    real = np.linspace(xmin, xmax, int((xmax - xmin) * self.resolution))
-    imag = np.linspace(ymin, ymax, int((ymax - ymin) * self.resolution))
+    real, imag = self.grid_axes()
+    dtype = PRECISIONS[self.select_precision()]
+    real = real.astype(dtype, copy=False)
+    imag = imag.astype(dtype, copy=False)
     self.complex_set = real[np.newaxis, :] + (imag[:, np.newaxis] * 1j)
 
+  def escape_time(self, c):
+    """
+    Returns the number of iterations before given complex numbers escape the threshold.
+
+    Args:
+        c (np.array): The complex numbers to iterate.
+
+    Returns:
+        (np.array): Integer iteration counts, equal to self.num for points that never escape.
+    """
+    return escape_time(c, self.num, self.threshold, self.fast_path, self.backend, self.select_precision())
+
   def is_mandelbrot(self, c):
     """
     Returns if given complex number is within Mandelbrot Set.
@@ -86,56 +189,294 @@ class MandelbrotSet():
     Returns:
         (boolean): Whether complex number is within Mandelbrot Set.
     """
-    z = 0
-    for i in range(self.num):
-      z = (z**2) + c
-    return abs(z) <= self.threshold
+    return self.escape_time(c) == self.num
 
   def generate_mandelbrot_set(self):
     """
     Returns an array full of complex numbers within Mandelbrot Set.
 
+    When more than one worker is requested, the grid is rendered tile by tile in a
+    process pool, and with the "mariani_silver" strategy only rectangle borders are
+    iterated. With the "perturbation" strategy, one reference orbit is iterated in
+    decimal arithmetic and every pixel as a float64 offset from it. In these cases
+    self.complex_set is left unallocated.
+
     Args:
         None
 
     Returns:
         mask (np.array): An array indicating which elements in complex set are Mandelbrot Set.
     """
-    self.generate_complex_set()
-    mask = self.is_mandelbrot(self.complex_set)
-    self.mandelbrot_set = self.complex_set[mask]
-    return mask
+    self.state = None
+    cached = None
+    if self.cache is not None:
+      with self.metrics.stage("cache"):
+        cached = self.cache.load_arrays("MandelbrotSet.iterations", self.parameters())
+    if cached is not None:
+      self.iterations = cached["iterations"]
+      self.metrics.count("cache_hits", 1)
+    elif self.strategy == "perturbation":
+      with self.metrics.stage("iterate"):
+        self.iterations = perturbation_counts(self.xrange, self.yrange, self.resolution, self.num, self.threshold)
+    elif self.strategy == "mariani_silver":
+      with self.metrics.stage("iterate"):
+        self.iterations = mariani_silver_counts(self.xrange, self.yrange, self.resolution, self.num, self.threshold,
+                                                self.fast_path, backend=self.backend,
+                                                precision=self.select_precision())
+    elif self.workers == 1:
+      with self.metrics.stage("complex_set"):
+        self.generate_complex_set()
+      with self.metrics.stage("iterate"):
+        if self.backend != "numpy":
+          self.iterations = self.escape_time(self.complex_set)
+        else:
+          self.state = escape_time_state(self.complex_set, self.num, self.threshold, self.fast_path)
+          self.iterations = self.state.counts
+    else:
+      with self.metrics.stage("iterate"):
+        self.iterations = render_tiled(self.xrange, self.yrange, self.resolution, self.num, self.threshold,
+                                       self.fast_path, self.workers, self.tile_size, self.backend,
+                                       self.select_precision())
+    if self.strategy != "perturbation":
+      dtype = count_dtype(self.num, complex_dtype(self.select_precision()))
+      self.iterations = self.iterations.astype(dtype, copy=False)
+    if self.cache is not None and cached is None:
+      with self.metrics.stage("cache"):
+        self.cache.save_arrays("MandelbrotSet.iterations", self.parameters(), {"iterations": self.iterations})
+    return self.collect_mandelbrot_set()
 
-  def draw_fractal(self):
+  def refine(self, num):
     """
-    Draws and saves fractal given class.
+    Deepens the last render to num iterations.
+
+    Only the points that were still iterating when the last render stopped are
+    iterated again, from their saved z, so rendering at 100, 500 and then 5000
+    iterations costs about as much as rendering at 5000 once.
+
+    Args:
+        num (int): The new number of iterations.
+
+    Returns:
+        mask (np.array): An array indicating which elements in complex set are Mandelbrot Set.
+    """
+    if self.state is None or self.state.num > num:
+      self.num = num
+      return self.generate_mandelbrot_set()
+    self.state = escape_time_state(None, num, self.threshold, self.fast_path, self.state)
+    self.num = num
+    self.iterations = self.state.counts
+    return self.collect_mandelbrot_set()
+
+  def collect_mandelbrot_set(self):
+    """
+    Collects the complex numbers within Mandelbrot Set from the iteration counts.
 
     Args:
         None
 
     Returns:
+        mask (np.array): An array indicating which elements in complex set are Mandelbrot Set.
+    """
+    with self.metrics.stage("mask"):
+      mask = self.iterations == self.num
+      self.packed_mask = np.packbits(mask, axis=-1)
+      if self.select_precision() == "single" and self.is_scatter is not True:
+        self.mandelbrot_set = None
+      else:
+        real, imag = self.grid_axes()
+        rows, cols = np.nonzero(mask)
+        self.mandelbrot_set = real[cols] + (imag[rows] * 1j)
+    self.metrics.count("pixels", mask.size)
+    self.metrics.count("members", np.count_nonzero(mask))
+    return mask
+
+  def unpack_mask(self):
+    """
+    Returns the membership mask of the last render from its packed form.
+
+    Args:
         None
+
+    Returns:
+        mask (np.array): An array indicating which elements in complex set are Mandelbrot Set.
     """
-    mask = self.generate_mandelbrot_set()
-    if self.is_scatter is True:
-      plt.scatter(self.mandelbrot_set.real, self.mandelbrot_set.imag, color="black", marker=",", s=1)
-      self.plot.set_title(f'Mandelbrot Fractal with {self.resolution} Pixel Resolution')
-      plt.gca().set_aspect("equal")
-      self.plot.axis("off")
-      timestamp = time.strftime("%Y%m%d%H%M%S")
-      filename = "MandelbrotFractal_" + timestamp + ".png"
-      final_output_path = os.path.join(self.output_path, filename)
-      plt.savefig(final_output_path)
-      plt.show()
+    return np.unpackbits(self.packed_mask, axis=-1, count=self.iterations.shape[-1]).view(bool)
+
+  def generate_progressive(self, levels=DEFAULT_LEVELS, adaptive=True, callback=None):
+    """
+    Yields previews of the iteration counts from coarse to full resolution.
 
+    Each level halves the pixel stride of the previous one and reuses its samples.
+    Once the full-resolution level is done, self.iterations and self.mandelbrot_set
+    are updated as in generate_mandelbrot_set.
+
+    Args:
+        levels (int): The number of levels coarser than full resolution.
+        adaptive (boolean): Whether blocks that were uniform at the previous level are filled without iterating.
+        callback (function): Called with the stride and counts of every level, or None.
+
+    Yields:
+        stride (int): The pixel stride of the level (1 for full resolution).
+        counts (np.array): The iteration counts of the level.
+    """
+    for stride, counts in progressive_counts(self.xrange, self.yrange, self.resolution, self.num, self.threshold,
+                                             self.fast_path, levels, adaptive, self.backend, self.select_precision()):
+      if callback is not None:
+        callback(stride, counts)
+      if stride == 1:
+        self.iterations = counts.astype(count_dtype(self.num, complex_dtype(self.select_precision())), copy=False)
+        self.collect_mandelbrot_set()
+      yield stride, counts
+
+  def stream_to_disk(self, band_rows=DEFAULT_BAND_ROWS):
+    """
+    Renders iteration counts straight to a memory-mapped .npy file in the output directory.
+
+    Args:
+        band_rows (int): The number of rows computed and held in memory at once.
+
+    Returns:
+        final_output_path (str): The path of the written file.
+    """
+    timestamp = output_timestamp()
+    filename = "MandelbrotFractal_" + timestamp + ".npy"
+    final_output_path = os.path.join(self.output_path, filename)
+    counts = render_bands(self.xrange, self.yrange, self.resolution, self.num, self.threshold,
+                          final_output_path, self.fast_path, band_rows, self.backend, self.select_precision())
+    del counts
+    return final_output_path
+
+  def generate_smooth(self, band_rows=DEFAULT_BAND_ROWS):
+    """
+    Returns the normalized continuous iteration counts of the grid, computed band by band.
+
+    Only one band of complex numbers exists at a time, so the full grid is never
+    held as complex numbers. A larger threshold gives smoother colors.
+
+    Args:
+        band_rows (int): The number of rows computed at once.
+
+    Returns:
+        (np.array): float32 values with one row per imaginary value, between 0 and 1 outside the set and 1 inside.
+    """
+    real, imag = self.grid_axes()
+    self.smooth = np.empty((imag.size, real.size), dtype=np.float32)
+    with self.metrics.stage("iterate"):
+      for r0 in range(0, imag.size, band_rows):
+        c = real[np.newaxis, :] + (imag[r0:r0 + band_rows, np.newaxis] * 1j)
+        self.smooth[r0:r0 + band_rows] = smooth_escape_time(c, self.num, self.threshold, self.fast_path, self.backend,
+                                                            self.select_precision())
+    return self.smooth
+
+  def save_image(self, cmap="binary", colored=False, raw=False, smooth=False, equalize=False):
+    """
+    Saves the fractal pixel for pixel, mapping it through a colormap lookup table.
+
+    Unlike draw_fractal, no Matplotlib figure is involved, so the image has exactly
+    one pixel per grid point. The largest imaginary value is in the top row.
+    Smooth and equalized images color the points outside the set and leave the
+    set black; their PNG rows are colored and written one band at a time.
+
+    Args:
+        cmap (str): The name of the Matplotlib colormap.
+        colored (boolean): Whether iteration counts are colored instead of the binary mask.
+        raw (boolean): Whether the RGB array is saved as .npy instead of PNG.
+        smooth (boolean): Whether the continuous iteration counts are colored.
+        equalize (boolean): Whether the palette is spread by histogram equalization.
+
+    Returns:
+        final_output_path (str): The path of the saved image.
+    """
+    timestamp = output_timestamp()
+    filename = "MandelbrotFractal_" + timestamp + (".npy" if raw is True else ".png")
+    final_output_path = os.path.join(self.output_path, filename)
+    if smooth is True or equalize is True:
+      if smooth is True:
+        values = self.smooth if self.smooth is not None else self.generate_smooth()
+      else:
+        if self.iterations is None:
+          self.generate_mandelbrot_set()
+        values = self.iterations / np.float32(max(self.num, 1))
+      lut = colormap_lut(cmap)
+      curve = equalization_curve(values) if equalize is True else None
+      with self.metrics.stage("save"):
+        if raw is True:
+          np.save(final_output_path, colorize(values[::-1], lut, curve))
+        else:
+          write_colored_png(final_output_path, values, lut, curve)
+      return final_output_path
+
+    if self.iterations is None:
+      self.generate_mandelbrot_set()
+    if colored is True:
+      lut = colormap_lut(cmap)
+      image = lut[(self.iterations[::-1].astype(np.int64) * (len(lut) - 1)) // max(self.num, 1)]
     else:
-      self.plot.imshow(mask, cmap = "binary")
-      self.plot.set_title(f'Mandelbrot Fractal with {self.resolution} Pixel Resolution')
-      plt.gca().set_aspect("equal")
-      self.plot.axis("off")
-      timestamp = time.strftime("%Y%m%d%H%M%S")
+      image = colormap_lut(cmap, 2)[(self.iterations[::-1] == self.num).view(np.uint8)]
+
+    if raw is True:
+      np.save(final_output_path, image)
+    else:
+      write_png(final_output_path, image)
+    return final_output_path
+
+  def parameters(self):
+    """
+    Returns the parameters that determine the iteration counts of the fractal.
+
+    Every setting that can change the counts is included, so renders with a
+    different strategy, kernel or reference orbit precision never share a cache entry.
+
+    Args:
+        None
+
+    Returns:
+        (dict): The window, threshold, number of iterations, resolution, precision, strategy and kernel settings.
+    """
+    params = {"xrange": self.xrange, "yrange": self.yrange, "threshold": self.threshold,
+              "num": self.num, "resolution": self.resolution, "precision": self.select_precision(),
+              "strategy": self.strategy, "backend": self.backend, "fast_path": self.fast_path}
+    if self.strategy == "perturbation":
+      params["guard_digits"] = GUARD_DIGITS
+    return params
+
+  def draw_fractal(self, filename=None):
+    """
+    Draws and saves fractal given class.
+
+    Args:
+        filename (str): The image file name, a timestamped name when None.
+
+    Returns:
+        final_output_path (str): The path of the saved image.
+    """
+    if filename is None:
+      timestamp = output_timestamp()
       filename = "MandelbrotFractal_" + timestamp + ".png"
-      final_output_path = os.path.join(self.output_path, filename)
-      plt.savefig(final_output_path)
-      plt.show()
+    final_output_path = os.path.join(self.output_path, filename)
+    image_params = dict(self.parameters(), scatter=self.is_scatter)
+    self.metrics = RenderMetrics()
+    with self.metrics.stage("cache"):
+      cached = self.cache is not None and self.cache.fetch_image("MandelbrotSet.image", image_params, final_output_path)
+    if cached:
+      self.metrics.count("cache_hits", 1)
+    else:
+      mask = self.generate_mandelbrot_set()
+      with self.metrics.stage("artists"):
+        if self.is_scatter is True:
+          self.plot.scatter(self.mandelbrot_set.real, self.mandelbrot_set.imag, color="black", marker=",", s=1)
+
+        else:
+          self.plot.imshow(mask, cmap = "binary")
+
+        self.plot.set_title(f'Mandelbrot Fractal with {self.resolution} Pixel Resolution')
+        self.plot.set_aspect("equal")
+        self.plot.axis("off")
+      with self.metrics.stage("save"):
+        save_figure(self.figure, final_output_path, self.headless)
+      if self.cache is not None:
+        self.cache.store_image("MandelbrotSet.image", image_params, final_output_path)
+    if self.metrics_log is not None:
+      self.metrics.write_log(self.metrics_log, fractal="MandelbrotSet", params=self.parameters(), output=final_output_path)
+    return final_output_path
     
\ No newline at end of file
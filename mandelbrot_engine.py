@@ -0,0 +1,518 @@
+## Imports packages used in this module.
+import numpy as np
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+## Squared distance under which two orbit points are treated as the same point.
+PERIODICITY_EPSILON = 1e-20
+
+## Iterations before orbits are first checked for cycles, and iterations between later checks (powers of two).
+PERIODICITY_WARMUP = 64
+PERIODICITY_INTERVAL = 32
+
+## Float type of the real and imaginary parts at each precision.
+PRECISIONS = {
+    "double": np.float64,
+    "single": np.float32,
+}
+
+## Rounding error, relative to the largest coordinate, that single precision is budgeted to gather per iteration.
+SINGLE_PRECISION_ERROR = 2.0 ** -20
+
+## Picks the cheapest precision that resolves a window.
+def select_precision(xrange, yrange, resolution, num):
+    """
+    Returns "single" when float32 resolves the pixel grid of a window and "double" otherwise.
+
+    float32 keeps 24 bits of mantissa, and every iteration adds rounding error
+    that the orbit can amplify, so deeper renders need wider pixels. The pixel
+    spacing must cover num times SINGLE_PRECISION_ERROR (16 float32 rounding
+    steps per iteration) of the largest coordinate, which keeps wide, shallow
+    views in single precision and moves deep iteration counts to double.
+
+    Args:
+        xrange (tuple): The range of the real numbers.
+        yrange (tuple): The range of the imaginary numbers.
+        resolution (int): The number of pixels per unit length.
+        num (int): The maximum number of iterations.
+
+    Returns:
+        (str): "single" or "double".
+    """
+    magnitude = max(1.0, *(abs(float(value)) for value in (*xrange, *yrange)))
+    return "single" if (1.0 / resolution) >= magnitude * max(num, 1) * SINGLE_PRECISION_ERROR else "double"
+
+## Complex type of a precision.
+def complex_dtype(precision):
+    """
+    Returns the complex type whose parts are stored at given precision.
+
+    Args:
+        precision (str): One of PRECISIONS.
+
+    Returns:
+        (np.dtype): complex64 for "single" and complex128 for "double".
+    """
+    return np.result_type(PRECISIONS[precision], np.complex64)
+
+## Integer type of the iteration counts.
+def count_dtype(num, dtype=np.complex128):
+    """
+    Returns the integer type used for the iteration counts of given complex numbers.
+
+    Single precision inputs get uint16 counts whenever num fits, so the counts
+    take half the memory of the default int32 counts.
+
+    Args:
+        num (int): The maximum number of iterations.
+        dtype (np.dtype): The complex type of the inputs.
+
+    Returns:
+        (np.dtype): uint16 or int32.
+    """
+    if np.dtype(dtype) == np.complex64 and num <= np.iinfo(np.uint16).max:
+        return np.dtype(np.uint16)
+    return np.dtype(np.int32)
+
+## Converts inputs to a complex type the kernels accept.
+def as_complex(c):
+    """
+    Returns given numbers as a complex64 array when they already are one, and as complex128 otherwise.
+
+    Args:
+        c (np.array): The complex numbers.
+
+    Returns:
+        (np.array): The numbers as complex64 or complex128.
+    """
+    c = np.asarray(c)
+    return c if c.dtype == np.complex64 else c.astype(np.complex128, copy=False)
+
+## Pixel axes of a Mandelbrot window.
+def grid_axes(xrange, yrange, resolution):
+    """
+    Returns the real and imaginary axes of the pixel grid covering a window.
+
+    Args:
+        xrange (tuple): The range of the real numbers.
+        yrange (tuple): The range of the imaginary numbers.
+        resolution (int): The number of pixels per unit length.
+
+    Returns:
+        real (np.array): The real part of every pixel column.
+        imag (np.array): The imaginary part of every pixel row.
+    """
+    xmin, xmax = xrange
+    ymin, ymax = yrange
+    real = np.linspace(xmin, xmax, int((xmax - xmin) * resolution))
+    imag = np.linspace(ymin, ymax, int((ymax - ymin) * resolution))
+    return real, imag
+
+## Fast-path classification of points known to be inside the Mandelbrot Set.
+def in_main_bulbs(c):
+    """
+    Returns whether given complex numbers lie in the main cardioid or the period-2 bulb.
+
+    Args:
+        c (np.array): The complex numbers to classify.
+
+    Returns:
+        (np.array): Boolean array shaped like c.
+    """
+    x = c.real
+    y_sq = c.imag * c.imag
+    q = (x - 0.25) ** 2 + y_sq
+    cardioid = q * (q + (x - 0.25)) <= 0.25 * y_sq
+    bulb = (x + 1) ** 2 + y_sq <= 0.0625
+    return cardioid | bulb
+
+## Checkpoint of an escape-time computation.
+class EscapeState():
+    """
+    A class that holds where an escape-time computation stopped, so a deeper
+    computation can resume instead of starting every point from z = 0.
+
+    Attributes:
+        counts (np.array): The iteration counts so far, shaped like the input.
+        index (np.array): The flat positions of the points that are still iterating.
+        z (np.array): The current orbit value of every point that is still iterating.
+        c (np.array): The complex number of every point that is still iterating.
+        num (int): The number of iterations performed so far.
+        threshold (float): The escape radius.
+        fast_path (boolean): Whether bulb rejection and periodicity checks are used.
+
+    Usage:
+        This class is returned by escape_time_state and passed back in to resume.
+    """
+
+    def __init__(self, counts, index, z, c, num, threshold, fast_path):
+        """
+        Initializes the Escape State.
+
+        Args:
+            counts (np.array): The iteration counts so far, shaped like the input.
+            index (np.array): The flat positions of the points that are still iterating.
+            z (np.array): The current orbit value of every point that is still iterating.
+            c (np.array): The complex number of every point that is still iterating.
+            num (int): The number of iterations performed so far.
+            threshold (float): The escape radius.
+            fast_path (boolean): Whether bulb rejection and periodicity checks are used.
+
+        Returns:
+            None
+        """
+        self.counts = counts
+        self.index = index
+        self.z = z
+        self.c = c
+        self.num = num
+        self.threshold = threshold
+        self.fast_path = fast_path
+
+## Escape-time engine shared by the Mandelbrot renderers.
+def escape_time_state(c, num, threshold, fast_path=True, state=None, magnitude=None):
+    """
+    Returns the escape-time iteration counts of given complex numbers together with a checkpoint.
+
+    Each point is iterated with z = z**2 + c until |z| passes the threshold
+    or num iterations have been performed. Escaped points are dropped from
+    the working arrays right away, so later iterations only touch the points
+    that are still active.
+
+    With fast_path enabled, points in the main cardioid and period-2 bulb are
+    classified before iterating, and the remaining points are checked for
+    orbit cycles Brent-style (the orbit is compared against a saved point
+    that is refreshed at every power of two), so interior points stop early.
+    The check only starts after PERIODICITY_WARMUP iterations, when most
+    exterior points have escaped, and then runs every PERIODICITY_INTERVAL
+    iterations into preallocated buffers. A cycle is still found, a few
+    iterations later, because the saved point stays fixed between powers of two.
+
+    When a state from an earlier, shallower call on the same points is given,
+    only its still-active points are iterated, from where that call stopped.
+
+    complex64 inputs are iterated in single precision.
+
+    Args:
+        c (np.array): The complex numbers to test (any shape).
+        num (int): The maximum number of iterations.
+        threshold (float): The escape radius.
+        fast_path (boolean): Whether to use bulb rejection and periodicity checks.
+        state (EscapeState): A checkpoint to resume from, or None to start at z = 0.
+        magnitude (np.array): A float array shaped like c that receives |z|**2 of every point when it escapes, or None.
+
+    Returns:
+        (EscapeState): The checkpoint after num iterations. Its counts hold the
+            iteration on which each point escaped (0 to num - 1), or num for
+            points that never escaped.
+    """
+    threshold_sq = float(threshold) ** 2
+    if state is not None and state.num <= num and state.threshold == threshold and state.fast_path == fast_path:
+        counts = state.counts.astype(count_dtype(num, state.c.dtype))
+        counts[counts == state.num] = num
+        flat_counts = counts.reshape(-1)
+        index = state.index
+        z = state.z.copy()
+        c_active = state.c
+        start = state.num
+    else:
+        c = as_complex(c)
+        counts = np.full(c.shape, num, dtype=count_dtype(num, c.dtype))
+        flat_counts = counts.reshape(-1)
+
+        c_active = c.reshape(-1).copy()
+        index = np.arange(c_active.size)
+        z = np.zeros_like(c_active)
+        start = 0
+
+        # The bulbs stay within |z| <= 2, so they are only safe to skip for a threshold of at least 2.
+        if fast_path and threshold >= 2 and num > 0:
+            active = ~in_main_bulbs(c_active)
+            z = z[active]
+            c_active = c_active[active]
+            index = index[active]
+
+    flat_magnitude = magnitude.reshape(-1) if magnitude is not None else None
+    # Saved orbit points are kept by flat index, so compaction does not have to carry them along.
+    saved = np.empty(counts.size, dtype=z.dtype) if fast_path else None
+    if fast_path:
+        saved[index] = z
+    next_save = 1
+    # Work buffers sized for the first iteration; later iterations use their leading part.
+    radius_buffer = np.empty(z.size, dtype=z.real.dtype)
+    square_buffer = np.empty(z.size, dtype=z.real.dtype)
+    escaped_buffer = np.empty(z.size, dtype=bool)
+    cycled_buffer = np.empty(z.size, dtype=bool)
+    diff_buffer = np.empty(z.size, dtype=z.dtype) if fast_path else None
+
+    for i in range(start, num):
+        size = index.size
+        if size == 0:
+            break
+        np.multiply(z, z, out=z)
+        z += c_active
+        radius = np.multiply(z.real, z.real, out=radius_buffer[:size])
+        radius += np.multiply(z.imag, z.imag, out=square_buffer[:size])
+        escaped = np.greater(radius, threshold_sq, out=escaped_buffer[:size])
+        done = escaped
+        step = i + 1 - start
+        if fast_path:
+            if step >= PERIODICITY_WARMUP and step % PERIODICITY_INTERVAL == 0:
+                diff = np.take(saved, index, out=diff_buffer[:size])
+                np.subtract(z, diff, out=diff)
+                distance = np.multiply(diff.real, diff.real, out=square_buffer[:size])
+                distance += np.multiply(diff.imag, diff.imag, out=diff.real)
+                cycled = np.less(distance, PERIODICITY_EPSILON, out=cycled_buffer[:size])
+                done = np.logical_or(escaped, cycled, out=cycled)
+            if step == next_save:
+                saved[index] = z
+                next_save *= 2
+        if done.any():
+            flat_counts[index[escaped]] = i
+            if flat_magnitude is not None:
+                flat_magnitude[index[escaped]] = radius[escaped]
+            active = ~done
+            z = z[active]
+            c_active = c_active[active]
+            index = index[active]
+
+    return EscapeState(counts, index, z, c_active, num, threshold, fast_path)
+
+## Allocation-free escape-time kernel on float pairs.
+def escape_time_inplace(c, num, threshold, fast_path=True, magnitude=None):
+    """
+    Returns the escape-time iteration counts using preallocated float buffers.
+
+    The real and imaginary parts are kept as separate float arrays and every
+    step writes into existing buffers through out= and in-place operators, so
+    the loop allocates nothing while most points are active. Escaped points
+    ride along (their overflow is ignored) until fewer than half of the points
+    remain active, at which point the buffers are compacted. complex64 inputs
+    use float32 buffers.
+
+    Args:
+        c (np.array): The complex numbers to test (any shape).
+        num (int): The maximum number of iterations.
+        threshold (float): The escape radius.
+        fast_path (boolean): Whether points in the main bulbs are skipped.
+        magnitude (np.array): A float array shaped like c that receives |z|**2 of every point when it escapes, or None.
+
+    Returns:
+        counts (np.array): Integer iteration counts shaped like c.
+    """
+    c = as_complex(c)
+    shape = c.shape
+    c = c.reshape(-1)
+    counts = np.full(c.size, num, dtype=count_dtype(num, c.dtype))
+    index = np.arange(c.size)
+    if fast_path and threshold >= 2 and num > 0:
+        index = index[~in_main_bulbs(c)]
+
+    cr = c.real[index]
+    ci = c.imag[index]
+    zr = np.zeros_like(cr)
+    zi = np.zeros_like(cr)
+    zr2 = np.zeros_like(cr)
+    zi2 = np.zeros_like(cr)
+    flat_magnitude = magnitude.reshape(-1) if magnitude is not None else None
+    radius = np.zeros_like(cr)
+    active = np.ones(cr.size, dtype=bool)
+    escaped = np.zeros(cr.size, dtype=bool)
+    threshold_sq = float(threshold) ** 2
+    remaining = cr.size
+
+    with np.errstate(over="ignore", invalid="ignore"):
+        for i in range(num):
+            if remaining == 0:
+                break
+            np.multiply(zr, zi, out=zi)
+            zi *= 2
+            zi += ci
+            np.subtract(zr2, zi2, out=zr)
+            zr += cr
+            np.multiply(zr, zr, out=zr2)
+            np.multiply(zi, zi, out=zi2)
+            np.add(zr2, zi2, out=radius)
+            np.greater(radius, threshold_sq, out=escaped)
+            escaped &= active
+            active ^= escaped
+            if escaped.any():
+                counts[index[escaped]] = i
+                if flat_magnitude is not None:
+                    flat_magnitude[index[escaped]] = radius[escaped]
+            remaining = np.count_nonzero(active)
+
+            if remaining < active.size // 2:
+                index, cr, ci, zr, zi, zr2, zi2 = (array[active] for array in (index, cr, ci, zr, zi, zr2, zi2))
+                radius = np.zeros_like(cr)
+                active = np.ones(cr.size, dtype=bool)
+                escaped = np.zeros(cr.size, dtype=bool)
+
+    return counts.reshape(shape)
+
+## Per-pixel compiled escape-time kernel, available when Numba is installed.
+if numba is not None:
+    @numba.njit(parallel=True, cache=True)
+    def _escape_time_jit(cr, ci, num, threshold_sq, skip_bulbs, counts, magnitude, keep_magnitude):
+        for k in numba.prange(cr.size):
+            x = cr[k]
+            y = ci[k]
+            if skip_bulbs:
+                q = (x - 0.25) ** 2 + (y * y)
+                if q * (q + (x - 0.25)) <= 0.25 * (y * y) or (x + 1) ** 2 + (y * y) <= 0.0625:
+                    counts[k] = num
+                    continue
+            zr = 0.0
+            zi = 0.0
+            count = num
+            for i in range(num):
+                zr2 = zr * zr
+                zi2 = zi * zi
+                zi = (2 * zr * zi) + y
+                zr = zr2 - zi2 + x
+                if (zr * zr) + (zi * zi) > threshold_sq:
+                    count = i
+                    if keep_magnitude:
+                        magnitude[k] = (zr * zr) + (zi * zi)
+                    break
+            counts[k] = count
+
+def escape_time_jit(c, num, threshold, fast_path=True, magnitude=None):
+    """
+    Returns the escape-time iteration counts using a compiled per-pixel loop.
+
+    Each pixel runs in its own loop and stops as soon as it escapes, in
+    parallel across cores. Requires Numba. The loop always runs in double
+    precision, but complex64 inputs still get compact counts.
+
+    Args:
+        c (np.array): The complex numbers to test (any shape).
+        num (int): The maximum number of iterations.
+        threshold (float): The escape radius.
+        fast_path (boolean): Whether points in the main bulbs are skipped.
+        magnitude (np.array): A float array shaped like c that receives |z|**2 of every point when it escapes, or None.
+
+    Returns:
+        counts (np.array): Integer iteration counts shaped like c.
+    """
+    if numba is None:
+        raise ImportError("The jit backend requires Numba.")
+    c = as_complex(c)
+    counts = np.empty(c.shape, dtype=count_dtype(num, c.dtype))
+    _escape_time_jit(np.ascontiguousarray(c.real, dtype=np.float64).reshape(-1),
+                     np.ascontiguousarray(c.imag, dtype=np.float64).reshape(-1),
+                     num, float(threshold) ** 2, bool(fast_path and threshold >= 2), counts.reshape(-1),
+                     magnitude.reshape(-1) if magnitude is not None else np.empty(0, dtype=np.float32),
+                     magnitude is not None)
+    return counts
+
+## Escape-time iteration counts without a checkpoint.
+def escape_time(c, num, threshold, fast_path=True, backend="numpy", precision=None, magnitude=None):
+    """
+    Returns the escape-time iteration count of every given complex number.
+
+    Args:
+        c (np.array): The complex numbers to test (any shape).
+        num (int): The maximum number of iterations.
+        threshold (float): The escape radius.
+        fast_path (boolean): Whether to use bulb rejection and periodicity checks.
+        backend (str): The kernel to run, one of KERNELS.
+        precision (str): One of PRECISIONS, or None to keep the precision of c.
+        magnitude (np.array): A float array shaped like c that receives |z|**2 of every point when it escapes, or None.
+
+    Returns:
+        counts (np.array): Integer array shaped like c. Escaped points hold the
+            iteration on which they escaped (0 to num - 1) and points that never
+            escaped hold num.
+    """
+    if precision is not None:
+        c = np.asarray(c, dtype=complex_dtype(precision))
+    return KERNELS[backend](c, num, threshold, fast_path, magnitude=magnitude)
+
+## Continuous iteration counts for smooth coloring.
+def smooth_escape_time(c, num, threshold, fast_path=True, backend="numpy", precision=None):
+    """
+    Returns normalized continuous iteration counts of given complex numbers.
+
+    An escaped point gets n + 1 - log2(log|z| / log R), where n is its integer
+    count, z its orbit value on escape and R the escape radius, clipped to lie
+    between n and n + 1. Neighboring pixels then change color gradually instead
+    of in bands. Larger thresholds give smoother results. The formula relies on
+    |z| squaring at every step, which only holds past 2, so for thresholds
+    below 2 the orbit of an escaped point is followed until |z| > 2 and n, z
+    and R are taken there. A point that escapes the threshold but never passes
+    2 keeps its integer count.
+
+    Args:
+        c (np.array): The complex numbers to test (any shape).
+        num (int): The maximum number of iterations.
+        threshold (float): The escape radius.
+        fast_path (boolean): Whether to use bulb rejection and periodicity checks.
+        backend (str): The kernel to run, one of KERNELS.
+        precision (str): One of PRECISIONS, or None to keep the precision of c.
+
+    Returns:
+        values (np.array): float32 values shaped like c, in [0, 1) for escaped points and 1 inside the set.
+    """
+    magnitude = np.ones(np.shape(c), dtype=np.float32)
+    counts = escape_time(c, num, threshold, fast_path, backend, precision, magnitude)
+    values = counts.astype(np.float32)
+    escaped = counts < num
+    steps = counts[escaped]
+    radius = float(threshold)
+    passed = magnitude[escaped]
+    smoothed = np.ones(steps.shape, dtype=bool)
+    if radius < 2:
+        radius = 2.0
+        passed = np.ones(steps.shape, dtype=np.float32)
+        further = escape_time(np.asarray(c)[escaped], num, radius, fast_path, backend, precision, passed)
+        smoothed = further < num
+        steps = np.where(smoothed, further, steps)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fraction = np.log2(np.log(passed) / (2 * np.log(radius)))
+    values[escaped] = steps + np.where(smoothed, 1 - np.clip(np.nan_to_num(fraction), 0, 1), 0)
+    values /= max(num, 1)
+    # Escaped points stay strictly below the value of the set, even when they escape on the last iteration.
+    values[escaped] = np.minimum(values[escaped], np.nextafter(np.float32(1), np.float32(0)))
+    return values
+
+## Reference kernel returning only the counts.
+def escape_time_numpy(c, num, threshold, fast_path=True, magnitude=None):
+    """
+    Returns the escape-time iteration counts using the compacting NumPy engine.
+
+    Args:
+        c (np.array): The complex numbers to test (any shape).
+        num (int): The maximum number of iterations.
+        threshold (float): The escape radius.
+        fast_path (boolean): Whether to use bulb rejection and periodicity checks.
+        magnitude (np.array): A float array shaped like c that receives |z|**2 of every point when it escapes, or None.
+
+    Returns:
+        counts (np.array): Integer iteration counts shaped like c.
+    """
+    return escape_time_state(c, num, threshold, fast_path, magnitude=magnitude).counts
+
+## Escape-time kernels by backend name.
+KERNELS = {
+    "numpy": escape_time_numpy,
+    "inplace": escape_time_inplace,
+}
+if numba is not None:
+    KERNELS["jit"] = escape_time_jit
+
+## Selects a kernel.
+def available_backends():
+    """
+    Returns the names of the kernels usable in this environment.
+
+    Args:
+        None
+
+    Returns:
+        (list): The backend names, "numpy" first.
+    """
+    return list(KERNELS)
@@ -0,0 +1,64 @@
+## Imports packages used in this module.
+import numpy as np
+from mandelbrot_engine import escape_time, grid_axes
+
+## Default number of refinement levels above full resolution.
+DEFAULT_LEVELS = 3
+
+## Renders a window from a coarse preview up to full resolution.
+def progressive_counts(xrange, yrange, resolution, num, threshold, fast_path=True, levels=DEFAULT_LEVELS, adaptive=True,
+                       backend="numpy", precision="double"):
+    """
+    Yields the iteration counts of a window level by level, from coarse to full resolution.
+
+    The first level samples every 2^levels-th pixel of the full grid, and every
+    following level halves that stride, so each level only computes the pixels
+    the previous levels did not. With adaptive enabled, a new pixel whose
+    enclosing block of previous-level samples all share one count is filled
+    with that count instead of being iterated, so large uniform regions are
+    not recomputed. This makes the final image an approximation that can
+    miss detail thinner than the previous level's stride.
+
+    Args:
+        xrange (tuple): The range of the real numbers.
+        yrange (tuple): The range of the imaginary numbers.
+        resolution (int): The number of pixels per unit length at full resolution.
+        num (int): The maximum number of iterations.
+        threshold (float): The escape radius.
+        fast_path (boolean): Whether to use bulb rejection and periodicity checks.
+        levels (int): The number of levels coarser than full resolution.
+        adaptive (boolean): Whether uniform blocks are filled without iterating.
+        backend (str): The escape-time kernel, one of mandelbrot_engine.KERNELS.
+        precision (str): The precision of the kernel, one of mandelbrot_engine.PRECISIONS.
+
+    Yields:
+        stride (int): The pixel stride of the level (1 for full resolution).
+        counts (np.array): The iteration counts of the level, a view into the full-resolution buffer.
+    """
+    real, imag = grid_axes(xrange, yrange, resolution)
+    counts = np.full((imag.size, real.size), -1, dtype=np.int32)
+
+    for level in range(levels, -1, -1):
+        stride = 2 ** level
+        sub = counts[::stride, ::stride]
+        rows, cols = np.nonzero(sub < 0)
+
+        if adaptive and level < levels:
+            # Corners of the enclosing block of samples from the previous (twice coarser) level.
+            r0 = (rows // 2) * 2
+            c0 = (cols // 2) * 2
+            r1 = r0 + 2
+            c1 = c0 + 2
+            inside = (r1 < sub.shape[0]) & (c1 < sub.shape[1])
+            uniform = np.zeros(rows.size, dtype=bool)
+            corner = sub[r0[inside], c0[inside]]
+            uniform[inside] = ((corner == sub[r0[inside], c1[inside]])
+                               & (corner == sub[r1[inside], c0[inside]])
+                               & (corner == sub[r1[inside], c1[inside]]))
+            sub[rows[uniform], cols[uniform]] = sub[r0[uniform], c0[uniform]]
+            rows = rows[~uniform]
+            cols = cols[~uniform]
+
+        c = real[cols * stride] + (imag[rows * stride] * 1j)
+        sub[rows, cols] = escape_time(c, num, threshold, fast_path, backend, precision)
+        yield stride, sub
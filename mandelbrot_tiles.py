@@ -0,0 +1,128 @@
+## Imports packages used in this module.
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+from mandelbrot_engine import complex_dtype, count_dtype, escape_time, grid_axes
+
+## Default edge length (in pixels) of a square render tile.
+DEFAULT_TILE_SIZE = 256
+
+## Default number of rows computed at once when streaming to disk.
+DEFAULT_BAND_ROWS = 256
+
+## Splits a grid into render tiles.
+def split_tiles(rows, cols, tile_size=DEFAULT_TILE_SIZE):
+    """
+    Returns the bounds of the tiles covering a grid.
+
+    Args:
+        rows (int): The number of rows in the grid.
+        cols (int): The number of columns in the grid.
+        tile_size (int): The edge length of a tile.
+
+    Returns:
+        (list): A list of (row_start, row_end, col_start, col_end) tuples.
+    """
+    return [(r, min(r + tile_size, rows), c, min(c + tile_size, cols))
+            for r in range(0, rows, tile_size)
+            for c in range(0, cols, tile_size)]
+
+## Computes one tile inside a worker process.
+def _render_tile(job):
+    """
+    Computes the iteration counts of one tile and writes them into shared memory.
+
+    Args:
+        job (tuple): The shared memory name, grid shape, tile bounds and engine parameters.
+
+    Returns:
+        None: Updates the shared output buffer.
+    """
+    name, shape, (r0, r1, c0, c1), xrange, yrange, resolution, num, threshold, fast_path, backend, precision = job
+    real, imag = grid_axes(xrange, yrange, resolution)
+    c = real[np.newaxis, c0:c1] + (imag[r0:r1, np.newaxis] * 1j)
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        out = np.ndarray(shape, dtype=count_dtype(num, complex_dtype(precision)), buffer=shm.buf)
+        out[r0:r1, c0:c1] = escape_time(c, num, threshold, fast_path, backend, precision)
+        del out
+    finally:
+        shm.close()
+
+## Renders the iteration counts of a window across a process pool.
+def render_tiled(xrange, yrange, resolution, num, threshold, fast_path=True, workers=None, tile_size=DEFAULT_TILE_SIZE,
+                 backend="numpy", precision="double"):
+    """
+    Returns the escape-time iteration counts of a window, computed tile by tile in a process pool.
+
+    The workers write straight into a preallocated shared memory buffer, so
+    only the tile bounds travel between processes.
+
+    Args:
+        xrange (tuple): The range of the real numbers.
+        yrange (tuple): The range of the imaginary numbers.
+        resolution (int): The number of pixels per unit length.
+        num (int): The maximum number of iterations.
+        threshold (float): The escape radius.
+        fast_path (boolean): Whether to use bulb rejection and periodicity checks.
+        workers (int): The number of worker processes (all cores when None).
+        tile_size (int): The edge length of a tile.
+        backend (str): The escape-time kernel, one of mandelbrot_engine.KERNELS.
+        precision (str): The precision of the kernel, one of mandelbrot_engine.PRECISIONS.
+
+    Returns:
+        counts (np.array): Integer iteration counts with one row per imaginary value.
+    """
+    real, imag = grid_axes(xrange, yrange, resolution)
+    shape = (imag.size, real.size)
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    dtype = count_dtype(num, complex_dtype(precision))
+    shm = shared_memory.SharedMemory(create=True, size=max(1, shape[0] * shape[1] * dtype.itemsize))
+    try:
+        jobs = [(shm.name, shape, tile, xrange, yrange, resolution, num, threshold, fast_path, backend, precision)
+                for tile in split_tiles(shape[0], shape[1], tile_size)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for _ in pool.map(_render_tile, jobs):
+                pass
+        counts = np.ndarray(shape, dtype=dtype, buffer=shm.buf).copy()
+    finally:
+        shm.close()
+        shm.unlink()
+    return counts
+
+## Streams the iteration counts of a window to disk in row bands.
+def render_bands(xrange, yrange, resolution, num, threshold, path, fast_path=True, band_rows=DEFAULT_BAND_ROWS,
+                 backend="numpy", precision="double"):
+    """
+    Renders the escape-time iteration counts of a window into a memory-mapped .npy file.
+
+    Only one band of rows is held in memory at a time, so peak memory is set by
+    band_rows and the image width rather than by the full image size.
+
+    Args:
+        xrange (tuple): The range of the real numbers.
+        yrange (tuple): The range of the imaginary numbers.
+        resolution (int): The number of pixels per unit length.
+        num (int): The maximum number of iterations.
+        threshold (float): The escape radius.
+        path (str): The .npy file to write.
+        fast_path (boolean): Whether to use bulb rejection and periodicity checks.
+        band_rows (int): The number of rows computed at once.
+        backend (str): The escape-time kernel, one of mandelbrot_engine.KERNELS.
+        precision (str): The precision of the kernel, one of mandelbrot_engine.PRECISIONS.
+
+    Returns:
+        counts (np.memmap): The iteration counts, backed by the file at path.
+    """
+    real, imag = grid_axes(xrange, yrange, resolution)
+    counts = np.lib.format.open_memmap(path, mode="w+", dtype=count_dtype(num, complex_dtype(precision)),
+                                       shape=(imag.size, real.size))
+    for r0 in range(0, imag.size, band_rows):
+        r1 = min(r0 + band_rows, imag.size)
+        c = real[np.newaxis, :] + (imag[r0:r1, np.newaxis] * 1j)
+        counts[r0:r1] = escape_time(c, num, threshold, fast_path, backend, precision)
+        counts.flush()
+    return counts
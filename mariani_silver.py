@@ -0,0 +1,246 @@
+## Imports packages used in this module.
+import numpy as np
+from mandelbrot_engine import EscapeState, complex_dtype, count_dtype, escape_time, escape_time_state, grid_axes
+
+## Rectangles at most this many pixels across are computed pixel by pixel.
+DEFAULT_MIN_SIZE = 8
+
+## Iterations run on every batch of border pixels before the slow ones are put off.
+BATCH_DEPTH = 32
+
+## Iterations the put-off pixels are resumed to while rectangles wait on them.
+FLUSH_DEPTH = 128
+
+## Markers of pixels not computed yet, put off after BATCH_DEPTH and still running after FLUSH_DEPTH.
+UNKNOWN = -1
+DEFERRED = -2
+STALLED = -3
+
+## Lists the pixels of a batch of rectangles.
+def _spans(starts, lengths):
+    """
+    Returns the concatenated ranges starts[i] to starts[i] + lengths[i], without a Python loop.
+
+    Args:
+        starts (np.array): The first value of every range.
+        lengths (np.array): The length of every range.
+
+    Returns:
+        (np.array): All ranges one after another.
+    """
+    offsets = np.cumsum(lengths) - lengths
+    return np.arange(lengths.sum()) - np.repeat(offsets - starts, lengths)
+
+## Iterates a batch of pixels.
+def _iterate(counts, flat, c, depth, num, threshold, fast_path, marker, state=None):
+    """
+    Iterates the given pixels up to depth and records the ones that are settled.
+
+    Pixels that escape get their count, pixels found inside the set get num,
+    and pixels still running are marked and handed back with their orbits,
+    so a later call can resume them.
+
+    Args:
+        counts (np.array): The iteration counts buffer.
+        flat (np.array): The flat index of every pixel.
+        c (np.array): The complex number of every pixel.
+        depth (int): The number of iterations to stop at.
+        num (int): The maximum number of iterations.
+        threshold (float): The escape radius.
+        fast_path (boolean): Whether to use bulb rejection and periodicity checks.
+        marker (int): The value recorded for the pixels still running.
+        state (EscapeState): The orbits of the pixels to resume, or None to start at z = 0.
+
+    Returns:
+        flat (np.array): The flat index of every pixel still running.
+        state (EscapeState): The orbits of the pixels still running.
+    """
+    state = escape_time_state(c, depth, threshold, fast_path, state)
+    values = state.counts.astype(np.int32)
+    if depth < num:
+        # Stopping without escaping means a cycle or a main bulb, unless the pixel is still running.
+        values[values == depth] = num
+        values[state.index] = marker
+    counts.reshape(-1)[flat] = values
+    running = np.arange(state.index.size)
+    return flat[state.index], EscapeState(np.full(running.size, depth, dtype=np.int32), running, state.z, state.c,
+                                          depth, threshold, fast_path)
+
+## Computes the pixels of a window listed by their flat index.
+def _compute(counts, real, imag, flat, order, num, threshold, fast_path, backend, precision, pool):
+    """
+    Computes the iteration counts of the listed pixels that are still unknown, each once.
+
+    With the numpy backend, pixels are only iterated BATCH_DEPTH times. Those
+    still running are marked DEFERRED and added to the pool, which _flush
+    resumes later.
+
+    Args:
+        counts (np.array): The iteration counts buffer (UNKNOWN where not computed yet).
+        real (np.array): The real part of every pixel column.
+        imag (np.array): The imaginary part of every pixel row.
+        flat (np.array): The flat index of every listed pixel, possibly repeated.
+        order (np.array): A scratch buffer of the size of counts, used to drop repeated pixels.
+        num (int): The maximum number of iterations.
+        threshold (float): The escape radius.
+        fast_path (boolean): Whether to use bulb rejection and periodicity checks.
+        backend (str): The escape-time kernel, one of mandelbrot_engine.KERNELS.
+        precision (str): The precision of the kernel, one of mandelbrot_engine.PRECISIONS.
+        pool (list): The flat indices and orbits of the deferred pixels, extended in place.
+
+    Returns:
+        None: Updates counts and pool.
+    """
+    flat = flat[counts.reshape(-1)[flat] == UNKNOWN]
+    # The last write of every repeated index wins, so keeping the positions that won drops the repeats.
+    positions = np.arange(flat.size)
+    order[flat] = positions
+    flat = flat[order[flat] == positions]
+    if flat.size == 0:
+        return
+    rows, cols = np.divmod(flat, counts.shape[1])
+    c = (real[cols] + (imag[rows] * 1j)).astype(complex_dtype(precision), copy=False)
+    if backend != "numpy" or BATCH_DEPTH >= num:
+        counts[rows, cols] = escape_time(c, num, threshold, fast_path, backend, precision)
+        return
+    flat, state = _iterate(counts, flat, c, BATCH_DEPTH, num, threshold, fast_path, DEFERRED)
+    if flat.size > 0:
+        pool.append((flat, state))
+
+## Resumes deferred pixels of a window.
+def _flush(counts, pool, depth, num, threshold, fast_path):
+    """
+    Resumes every pixel of the pool in one batch and iterates it to depth.
+
+    Pixels still running at depth are marked STALLED and left as the only
+    entry of the pool.
+
+    Args:
+        counts (np.array): The iteration counts buffer.
+        pool (list): The flat indices and orbits of the deferred pixels, all stopped at the same depth.
+        depth (int): The number of iterations to stop at.
+        num (int): The maximum number of iterations.
+        threshold (float): The escape radius.
+        fast_path (boolean): Whether to use bulb rejection and periodicity checks.
+
+    Returns:
+        None: Updates counts and pool.
+    """
+    if not pool:
+        return
+    flat = np.concatenate([entry[0] for entry in pool])
+    z = np.concatenate([entry[1].z for entry in pool])
+    c = np.concatenate([entry[1].c for entry in pool])
+    start = pool[0][1].num
+    pool.clear()
+    state = EscapeState(np.full(flat.size, start, dtype=np.int32), np.arange(flat.size), z, c, start, threshold,
+                        fast_path)
+    flat, state = _iterate(counts, flat, c, depth, num, threshold, fast_path, STALLED, state)
+    if flat.size > 0 and depth < num:
+        pool.append((flat, state))
+
+## Renders a window by Mariani-Silver rectangle subdivision.
+def mariani_silver_counts(xrange, yrange, resolution, num, threshold, fast_path=True, min_size=DEFAULT_MIN_SIZE,
+                          backend="numpy", precision="double"):
+    """
+    Returns the iteration counts of a window, computed by Mariani-Silver subdivision.
+
+    Only the border of each rectangle is iterated. When every border pixel has
+    the same count, the rectangle is filled with it, since the Mandelbrot Set is
+    connected and cannot hide inside a uniform border. Otherwise the rectangle
+    is split into four quarters that share its center lines.
+
+    Every generation of rectangles is handled as arrays: the borders of all of
+    them are iterated in one batch, together with the pixels of the small
+    rectangles of the generation before, and tested with one reduction. With
+    the numpy backend a batch only runs BATCH_DEPTH iterations. Pixels still
+    running then are kept with their orbits, and a rectangle whose border only
+    waits on such pixels is held back instead of being split. Once every
+    remaining rectangle is held back, the waiting pixels are resumed together,
+    first to FLUSH_DEPTH and then, for the few still running, to num. The long
+    tail of iterations near the boundary of the set is then paid in a few
+    batches rather than once per generation.
+
+    The result is not guaranteed to be identical to a per-pixel render. Only
+    pixel samples of a border are checked, so an escaping filament that passes
+    between two border pixels can be filled over, and a few isolated pixels
+    near the boundary of the set may then differ from the grid strategy.
+
+    Args:
+        xrange (tuple): The range of the real numbers.
+        yrange (tuple): The range of the imaginary numbers.
+        resolution (int): The number of pixels per unit length.
+        num (int): The maximum number of iterations.
+        threshold (float): The escape radius.
+        fast_path (boolean): Whether to use bulb rejection and periodicity checks.
+        min_size (int): Rectangles at most this many pixels across are computed pixel by pixel.
+        backend (str): The escape-time kernel, one of mandelbrot_engine.KERNELS.
+        precision (str): The precision of the kernel, one of mandelbrot_engine.PRECISIONS.
+
+    Returns:
+        counts (np.array): Integer iteration counts with one row per imaginary value.
+    """
+    real, imag = grid_axes(xrange, yrange, resolution)
+    counts = np.full((imag.size, real.size), UNKNOWN, dtype=np.int32)
+    order = np.empty(counts.size, dtype=np.int64)
+    width = real.size
+    pool = []
+    stalled = []
+    flush_depth = min(FLUSH_DEPTH, num)
+    # Every rectangle is one row of first row, end row, first column and end column.
+    rects = np.array([[0, imag.size, 0, real.size]] if counts.size > 0 else [], dtype=np.int64).reshape(-1, 4)
+    pending = np.zeros(0, dtype=np.int64)
+
+    while len(rects) > 0 or pending.size > 0:
+        r0, r1, c0, c1 = rects.T
+        height = r1 - r0
+        breadth = c1 - c0
+        # The border of every rectangle: its top row, bottom row, left column and right column.
+        lengths = np.stack((breadth, breadth, height, height), axis=1).reshape(-1)
+        first = np.stack((r0 * width + c0, (r1 - 1) * width + c0, r0 * width + c0, r0 * width + c1 - 1),
+                         axis=1).reshape(-1)
+        steps = np.tile([1, 1, width, width], len(rects))
+        border = np.repeat(first, lengths) + (_spans(np.zeros_like(lengths), lengths) * np.repeat(steps, lengths))
+        _compute(counts, real, imag, np.concatenate((border, pending)), order, num, threshold, fast_path, backend,
+                 precision, pool)
+        pending = np.zeros(0, dtype=np.int64)
+        if len(rects) == 0:
+            continue
+
+        values = counts.reshape(-1)[border]
+        starts = np.cumsum(2 * (breadth + height)) - 2 * (breadth + height)
+        low = np.minimum.reduceat(values, starts)
+        high = np.maximum.reduceat(values, starts)
+        # Two different settled counts split a rectangle even while some of its border is still running.
+        settled_low = np.minimum.reduceat(np.where(values < 0, np.iinfo(np.int32).max, values), starts)
+        waiting = (low < 0) & (settled_low >= high)
+        if waiting.all():
+            if pool:
+                _flush(counts, pool, flush_depth, num, threshold, fast_path)
+                stalled += pool
+                pool.clear()
+            else:
+                _flush(counts, stalled, num, num, threshold, fast_path)
+            continue
+        uniform = (low == high) & (low >= 0)
+        for a, b, c, d, value in zip(*rects[uniform].T.tolist(), low[uniform].tolist()):
+            counts[a + 1:b - 1, c + 1:d - 1] = value
+
+        mixed = rects[~(uniform | waiting)]
+        small = (mixed[:, 1] - mixed[:, 0] <= min_size) | (mixed[:, 3] - mixed[:, 2] <= min_size)
+        a, b, c, d = mixed[small].T
+        # Every row of a small rectangle is one span of flat indices.
+        row_starts = (_spans(a, b - a) * width) + np.repeat(c, b - a)
+        pending = _spans(row_starts, np.repeat(d - c, b - a))
+
+        a, b, c, d = mixed[~small].T
+        rm = (a + b) // 2
+        cm = (c + d) // 2
+        rects = np.concatenate((np.stack((a, rm + 1, c, cm + 1), axis=1), np.stack((a, rm + 1, cm, d), axis=1),
+                                np.stack((rm, b, c, cm + 1), axis=1), np.stack((rm, b, cm, d), axis=1),
+                                rects[waiting]))
+
+    _flush(counts, pool, flush_depth, num, threshold, fast_path)
+    stalled += pool
+    _flush(counts, stalled, num, num, threshold, fast_path)
+    return counts.astype(count_dtype(num, complex_dtype(precision)), copy=False)
@@ -0,0 +1,120 @@
+## Imports packages used in this module.
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+## Represents the measurements of a single render.
+class RenderMetrics():
+    """
+    A class that collects per-stage timings, allocation counters and primitive
+    counts of a render. Allocation counters are only recorded while tracemalloc
+    is tracing, so they cost nothing unless the caller turns tracing on.
+
+    Attributes:
+        stages (dict): The seconds spent in each stage, in the order the stages ran.
+        allocations (dict): The net and peak bytes allocated in each stage (when tracing), summed and maxed over repeats.
+        counts (dict): The number of points, segments, triangles or pixels generated.
+
+    Methods:
+        stage(self, name): Context manager that times and measures one stage.
+        count(self, name, value): Adds to a primitive counter.
+        total_seconds(self): Returns the time spent in all stages.
+        to_dict(self): Returns the metrics as a JSON friendly dictionary.
+        write_log(self, path, **fields): Appends the metrics as one JSON line.
+
+    Usage:
+        This class is filled in by the fractal classes while they render.
+    """
+
+    def __init__(self):
+        """
+        Initializes the Render Metrics.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        self.stages = {}
+        self.allocations = {}
+        self.counts = {}
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Times the code run inside the block and records it under name.
+
+        Args:
+            name (str): The stage name. Repeated stages add up their time and net bytes and keep their largest peak.
+
+        Returns:
+            None
+        """
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + (time.perf_counter() - start)
+            if tracing:
+                current, peak = tracemalloc.get_traced_memory()
+                previous = self.allocations.get(name, {"net_bytes": 0, "peak_bytes": 0})
+                self.allocations[name] = {"net_bytes": previous["net_bytes"] + (current - before),
+                                          "peak_bytes": max(previous["peak_bytes"], peak - before)}
+
+    def count(self, name, value):
+        """
+        Adds to a primitive counter.
+
+        Args:
+            name (str): The counter name, for example "segments".
+            value (int): The amount to add.
+
+        Returns:
+            None
+        """
+        self.counts[name] = self.counts.get(name, 0) + int(value)
+
+    def total_seconds(self):
+        """
+        Returns the time spent in all stages.
+
+        Args:
+            None
+
+        Returns:
+            (float): The total seconds.
+        """
+        return sum(self.stages.values())
+
+    def to_dict(self):
+        """
+        Returns the metrics as a JSON friendly dictionary.
+
+        Args:
+            None
+
+        Returns:
+            (dict): The stages, total time, counts and allocations.
+        """
+        return {"stages": dict(self.stages), "total_seconds": self.total_seconds(),
+                "counts": dict(self.counts), "allocations": dict(self.allocations)}
+
+    def write_log(self, path, **fields):
+        """
+        Appends the metrics and extra fields as one JSON line.
+
+        Args:
+            path (str): The log file.
+            **fields: Extra values stored next to the metrics, such as the fractal name.
+
+        Returns:
+            None
+        """
+        with open(path, "a") as file:
+            file.write(json.dumps(dict(fields, **self.to_dict()), default=str) + "\n")
@@ -0,0 +1,267 @@
+## Imports packages used in this module.
+import hashlib
+import json
+import os
+import shutil
+from decimal import Decimal
+import numpy as np
+
+## Default size limit of a render cache in bytes.
+DEFAULT_CACHE_BYTES = 1024 ** 3
+
+## Canonicalizes a parameter value for hashing.
+def _canonical(value):
+    """
+    Returns a JSON friendly value where equal parameters compare equal (2 and 2.0 hash the same).
+
+    Args:
+        value (object): A parameter value.
+
+    Returns:
+        (object): The canonical value.
+    """
+    if isinstance(value, bool) or value is None or isinstance(value, str):
+        return value
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        return float(value)
+    if isinstance(value, (tuple, list)):
+        return [_canonical(item) for item in value]
+    if isinstance(value, dict):
+        return {str(key): _canonical(item) for key, item in value.items()}
+    raise TypeError(f"Cannot hash parameter of type {type(value).__name__}.")
+
+## Hashes a set of render parameters.
+def render_key(kind, params):
+    """
+    Returns the content address of a render.
+
+    Args:
+        kind (str): What is cached, for example "MandelbrotSet.image".
+        params (dict): The parameters the render depends on.
+
+    Returns:
+        (str): A hex SHA-256 digest of the canonical parameters.
+    """
+    text = json.dumps({"kind": kind, "params": _canonical(params)}, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+## Represents an on-disk cache of rendered fractals.
+class RenderCache():
+    """
+    A class that stores computed arrays and encoded images under the hash of
+    their render parameters. Entries are evicted least recently used first
+    once the cache grows past its size limit.
+
+    Attributes:
+        directory (str): The folder holding the cache entries.
+        max_bytes (int): The size limit of the cache in bytes.
+
+    Methods:
+        fetch_image(self, kind, params, path): Places a cached image at path if there is one.
+        store_image(self, kind, params, path): Adds an image file to the cache.
+        load_arrays(self, kind, params): Returns cached arrays if there are any.
+        save_arrays(self, kind, params, arrays): Adds arrays to the cache.
+        load_bytes(self, kind, params, extension): Returns a cached file's contents if there is one.
+        save_bytes(self, kind, params, data, extension): Adds a file's contents to the cache.
+        evict(self): Removes least recently used entries until the cache fits its limit.
+
+    Usage:
+        This class is passed to a fractal so identical renders are served from disk.
+    """
+
+    def __init__(self, directory, max_bytes=DEFAULT_CACHE_BYTES):
+        """
+        Initializes the Render Cache.
+
+        Args:
+            directory (str): The folder holding the cache entries.
+            max_bytes (int): The size limit of the cache in bytes.
+
+        Returns:
+            None
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def _entry(self, kind, params, extension):
+        """
+        Returns the path of a cache entry.
+
+        Args:
+            kind (str): What is cached.
+            params (dict): The parameters the render depends on.
+            extension (str): The file extension of the entry.
+
+        Returns:
+            (str): The entry's path inside the cache directory.
+        """
+        return os.path.join(self.directory, render_key(kind, params) + extension)
+
+    def _touch(self, entry):
+        """
+        Marks an entry as recently used.
+
+        Args:
+            entry (str): The entry's path.
+
+        Returns:
+            (boolean): Whether the entry exists.
+        """
+        try:
+            os.utime(entry)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def fetch_image(self, kind, params, path):
+        """
+        Places the cached image of a render at path, hard linked when possible.
+
+        Args:
+            kind (str): What is cached.
+            params (dict): The parameters the render depends on.
+            path (str): Where the image is wanted.
+
+        Returns:
+            (boolean): Whether the image was in the cache.
+        """
+        entry = self._entry(kind, params, ".png")
+        if not self._touch(entry):
+            return False
+        if os.path.exists(path):
+            os.remove(path)
+        try:
+            os.link(entry, path)
+        except OSError:
+            shutil.copyfile(entry, path)
+        return True
+
+    def store_image(self, kind, params, path):
+        """
+        Adds an image file to the cache.
+
+        Args:
+            kind (str): What is cached.
+            params (dict): The parameters the render depends on.
+            path (str): The rendered image.
+
+        Returns:
+            None
+        """
+        entry = self._entry(kind, params, ".png")
+        temporary = entry + f".{os.getpid()}.tmp"
+        shutil.copyfile(path, temporary)
+        os.replace(temporary, entry)
+        self.evict()
+
+    def load_arrays(self, kind, params):
+        """
+        Returns the cached arrays of a render.
+
+        Args:
+            kind (str): What is cached.
+            params (dict): The parameters the render depends on.
+
+        Returns:
+            (dict): The arrays by name, or None when they are not cached.
+        """
+        entry = self._entry(kind, params, ".npz")
+        if not self._touch(entry):
+            return None
+        with np.load(entry) as data:
+            return {name: data[name] for name in data.files}
+
+    def save_arrays(self, kind, params, arrays):
+        """
+        Adds arrays to the cache.
+
+        Args:
+            kind (str): What is cached.
+            params (dict): The parameters the render depends on.
+            arrays (dict): The arrays by name.
+
+        Returns:
+            None
+        """
+        entry = self._entry(kind, params, ".npz")
+        temporary = entry + f".{os.getpid()}.tmp"
+        with open(temporary, "wb") as file:
+            np.savez(file, **arrays)
+        os.replace(temporary, entry)
+        self.evict()
+
+    def load_bytes(self, kind, params, extension=".png"):
+        """
+        Returns the contents of a cached file.
+
+        Args:
+            kind (str): What is cached.
+            params (dict): The parameters the render depends on.
+            extension (str): The file extension of the entry.
+
+        Returns:
+            (bytes): The file contents, or None when they are not cached.
+        """
+        entry = self._entry(kind, params, extension)
+        if not self._touch(entry):
+            return None
+        try:
+            with open(entry, "rb") as file:
+                return file.read()
+        except FileNotFoundError:
+            return None
+
+    def save_bytes(self, kind, params, data, extension=".png"):
+        """
+        Adds the contents of a file to the cache.
+
+        Args:
+            kind (str): What is cached.
+            params (dict): The parameters the render depends on.
+            data (bytes): The file contents.
+            extension (str): The file extension of the entry.
+
+        Returns:
+            None
+        """
+        entry = self._entry(kind, params, extension)
+        temporary = entry + f".{os.getpid()}.tmp"
+        with open(temporary, "wb") as file:
+            file.write(data)
+        os.replace(temporary, entry)
+        self.evict()
+
+    def evict(self):
+        """
+        Removes least recently used entries until the cache fits its size limit.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        entries = []
+        total = 0
+        with os.scandir(self.directory) as scan:
+            for item in scan:
+                if item.is_file() and not item.name.endswith(".tmp"):
+                    # Another process may evict or replace the entry between listing and stat.
+                    try:
+                        stat = item.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, item.path))
+                    total += stat.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
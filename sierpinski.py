@@ -1,8 +1,15 @@
 ## Imports packages used in this class.
 import os
-import time
 import numpy as np
-import matplotlib.pyplot as plt
+from matplotlib.collections import PolyCollection
+from figures import new_figure, output_timestamp, save_figure
+from fractal_rules import IFS
+from geometry_stream import DEFAULT_CHUNK_SIZE
+from image_writer import PNGWriter
+from metrics import RenderMetrics
+
+## Number of raster rows converted and compressed at once.
+RASTER_BAND_ROWS = 256
 
 ## Represents a Sierpinski Triangle Fractal Class.
 class SierpinskiTriangle:
@@ -16,19 +23,31 @@ class SierpinskiTriangle:
         coord1 (tuple): The first coordinate of the triangle.
         coord2 (tuple): The second coordinate of the triangle.
         coord3 (tuple): The third coordinate of the triangle.
+        is_raster (boolean): Whether the triangle is drawn as a pixel buffer instead of polygons.
+        headless (boolean): Whether the fractal is rendered without pyplot or an interactive window.
+        cache (RenderCache): The cache of rendered images, or None.
+        metrics (RenderMetrics): The stage timings and counts of the last render.
+        metrics_log (str): A file that receives one JSON line of metrics per render, or None.
+        figure (Figure): The figure holding the plot.
         plot (pyplot): The plot where the fractal is drawn.
         ouptut_path (str): The output directory of where the drawing is stored.
 
     Methods:
         find_midpoint(self, coord1, coord2): Finds the midpoint of two given coordinates.
         create_fractal(self, x, y, length, angle, iter): Creates and plots fractal given parameters.
-        draw_fractal(self): Draws and saves fractal using the parameters in class.
+        corners(self): Returns the corners of the outer triangle.
+        rule(self): Returns the three maps that shrink the triangle by half towards each of its corners.
+        generate_triangles(self): Returns the vertices of every leaf triangle as one array.
+        iter_triangles(self, chunk_size, min_size): Yields the vertices of the leaf triangles in chunks.
+        rasterize(self): Returns the triangle as a boolean pixel buffer.
+        parameters(self): Returns the parameters that determine the rendered fractal.
+        draw_fractal(self, filename): Draws and saves fractal using the parameters in class.
 
     Usage:
         This class is used to define and draw a Sierpinski's Triangle Fractal.
     """
     
-    def __init__(self, size, num, output_path):
+    def __init__(self, size, num, output_path, raster=False, headless=False, cache=None, metrics_log=None):
         """
         Initializes the Tree Fractal.
 
@@ -36,6 +55,10 @@ class SierpinskiTriangle:
             size (int): The overall size of the triangle.
             num (int): The number of iterations of fractal.
             ouptut_path (str): The output directory of where the drawing is stored.
+            raster (boolean): Whether the triangle is drawn as a pixel buffer instead of polygons.
+            headless (boolean): Whether the fractal is rendered without pyplot or an interactive window.
+            cache (RenderCache): The cache of rendered images, or None.
+            metrics_log (str): A file that receives one JSON line of metrics per render, or None.
 
         Returns:
             None
@@ -45,7 +68,12 @@ class SierpinskiTriangle:
         self.coord1 = (0, 0)
         self.coord2 = (self.size, 0)
         self.coord3 = (self.size / 2, (self.size * np.sqrt(3)) / 2)
-        _, self.plot = plt.subplots()
+        self.is_raster = raster
+        self.headless = headless
+        self.cache = cache
+        self.metrics = RenderMetrics()
+        self.metrics_log = metrics_log
+        self.figure, self.plot = new_figure(headless)
         self.output_path = output_path
 
     def find_midpoint(self, coord1, coord2):
@@ -85,21 +113,142 @@ class SierpinskiTriangle:
             self.create_fractal(midpoint1, coord2, midpoint2, iter - 1)
             self.create_fractal(midpoint3, midpoint2, coord3, iter - 1)
 
-    def draw_fractal(self):
+    def corners(self):
         """
-        Draws and saves fractal given class.
+        Returns the corners of the outer triangle.
+
+        Args:
+            None
+
+        Returns:
+            (np.array): A (3, 2) array of the corners.
+        """
+        return np.array([self.coord1, self.coord2, self.coord3], dtype=float)
+
+    def rule(self):
+        """
+        Returns the three maps that shrink the triangle by half towards each of its corners.
+
+        Args:
+            None
+
+        Returns:
+            (IFS): The maps towards the first, second and third corner.
+        """
+        corners = self.corners()
+        return IFS([np.column_stack((np.eye(2) / 2, corner / 2)) for corner in corners])
+
+    def generate_triangles(self):
+        """
+        Returns the vertices of every leaf triangle, composing the maps of a whole level at once.
+
+        Args:
+            None
+
+        Returns:
+            triangles (np.array): A (3^num, 3, 2) array of triangle vertices.
+        """
+        return self.rule().expand(self.corners(), self.num)
+
+    def iter_triangles(self, chunk_size=DEFAULT_CHUNK_SIZE, min_size=0.0):
+        """
+        Yields the vertices of the leaf triangles depth first and in chunks, without recursion.
+
+        Memory stays bounded by chunk_size and num however many triangles there are,
+        so the triangles can be written out while they are generated.
+
+        Args:
+            chunk_size (int): The largest number of triangles in one chunk.
+            min_size (float): The size below which a triangle is not split further, 0 to split all.
+
+        Yields:
+            triangles (np.array): An (n, 3, 2) array of triangle vertices.
+        """
+        yield from self.rule().iter_expand(self.corners(), self.num, None, False, chunk_size, min_size)
+
+    def rasterize(self):
+        """
+        Returns the triangle as a boolean pixel buffer built from Pascal's triangle mod 2.
+
+        Row r of the buffer holds the odd entries of row r of Pascal's triangle, which
+        are the columns c with (r & c) == c. Each entry is two pixels wide so the
+        triangle keeps its equilateral shape.
 
         Args:
             None
 
         Returns:
+            image (np.array): A (2^num, 2^(num + 1)) boolean array with the apex in the first row.
+        """
+        rows = 2 ** self.num
+        image = np.zeros((rows, 2 * rows), dtype=bool)
+        dtype = np.min_scalar_type(rows)
+        columns = np.arange(rows, dtype=dtype)
+        # Bands of rows keep the broadcast test as small as the image itself.
+        band_rows = max(1, (2 ** 24) // rows)
+        for r0 in range(0, rows, band_rows):
+            band = np.arange(r0, min(r0 + band_rows, rows), dtype=dtype)
+            r, c = np.nonzero((band[:, np.newaxis] & columns[np.newaxis, :]) == columns)
+            r = r + r0
+            left = rows - 1 - r + (2 * c)
+            image[r, left] = True
+            image[r, left + 1] = True
+        return image
+
+    def parameters(self):
+        """
+        Returns the parameters that determine the rendered fractal.
+
+        Args:
             None
+
+        Returns:
+            (dict): The size, number of iterations and drawing mode.
+        """
+        return {"size": self.size, "num": self.num, "raster": self.is_raster}
+
+    def draw_fractal(self, filename=None):
+        """
+        Draws and saves fractal given class.
+
+        Args:
+            filename (str): The image file name, a timestamped name when None.
+
+        Returns:
+            final_output_path (str): The path of the saved image.
         """
-        self.create_fractal(self.coord1, self.coord2, self.coord3, self.num)
-        self.plot.set_title(f'Sierpinski Triangle with {self.num} Iterations')
-        self.plot.axis('off')
-        timestamp = time.strftime("%Y%m%d%H%M%S")
-        filename = "SierpinskiTriange_" + timestamp + ".png"
+        self.metrics = RenderMetrics()
+        if filename is None:
+            timestamp = output_timestamp()
+            filename = "SierpinskiTriange_" + timestamp + ".png"
         final_output_path = os.path.join(self.output_path, filename)
-        plt.savefig(final_output_path)
-        plt.show()
\ No newline at end of file
+        with self.metrics.stage("cache"):
+            cached = self.cache is not None and self.cache.fetch_image("SierpinskiTriangle.image", self.parameters(), final_output_path)
+        if cached:
+            self.metrics.count("cache_hits", 1)
+        else:
+            if self.is_raster is True:
+                with self.metrics.stage("geometry"):
+                    image = self.rasterize()
+                self.metrics.count("pixels", image.size)
+                # The buffer is written as it is, one pixel per entry, without a figure.
+                with self.metrics.stage("save"):
+                    with PNGWriter(final_output_path, image.shape[1], image.shape[0], 1) as writer:
+                        for r0 in range(0, image.shape[0], RASTER_BAND_ROWS):
+                            writer.write_rows(np.where(image[r0:r0 + RASTER_BAND_ROWS], 0, 255).astype(np.uint8))
+            else:
+                with self.metrics.stage("geometry"):
+                    triangles = self.generate_triangles()
+                self.metrics.count("triangles", len(triangles))
+                with self.metrics.stage("artists"):
+                    self.plot.add_collection(PolyCollection(triangles, facecolors = 'black', edgecolors = 'none'))
+                    self.plot.autoscale_view()
+                    self.plot.set_title(f'Sierpinski Triangle with {self.num} Iterations')
+                    self.plot.axis('off')
+                with self.metrics.stage("save"):
+                    save_figure(self.figure, final_output_path, self.headless)
+            if self.cache is not None:
+                self.cache.store_image("SierpinskiTriangle.image", self.parameters(), final_output_path)
+        if self.metrics_log is not None:
+            self.metrics.write_log(self.metrics_log, fractal="SierpinskiTriangle", params=self.parameters(), output=final_output_path)
+        return final_output_path
@@ -0,0 +1,65 @@
+## Imports packages used in this module.
+import numpy as np
+import pytest
+from deep_zoom import delta_axes, perturbation_counts
+from mandelbrot import MandelbrotSet
+from mandelbrot_engine import escape_time, grid_axes
+from mandelbrot_tiles import render_tiled
+
+## Escape radius shared by the tests.
+THRESHOLD = 2
+
+## Seahorse valley window, with both boundary detail and interior.
+WINDOW = ((-0.76, -0.72), (0.08, 0.12), 2000)
+
+## Windows whose reference orbit stays bounded and escapes after 22 iterations, so pixels are rebased before it ends.
+PERTURBATION_WINDOWS = [WINDOW, ((-0.8, -0.7), (0.1, 0.2), 600)]
+
+## Builds a headless Mandelbrot render of the test window.
+def build(output_path, num, **options):
+    """
+    Returns a headless MandelbrotSet of the test window.
+
+    Args:
+        output_path (str): The output directory of the render.
+        num (int): The maximum number of iterations.
+        **options: Further keyword arguments of MandelbrotSet.
+
+    Returns:
+        (MandelbrotSet): The unrendered fractal.
+    """
+    xrange, yrange, resolution = WINDOW
+    return MandelbrotSet(xrange, yrange, THRESHOLD, num, resolution, False, str(output_path), headless=True, **options)
+
+@pytest.mark.parametrize("fast_path", [False, True])
+def test_refine_matches_fresh_render(tmp_path, fast_path):
+    refined = build(tmp_path, 50, fast_path=fast_path)
+    refined.generate_mandelbrot_set()
+    refined.refine(200)
+    mask = refined.refine(500)
+    assert refined.state.num == 500
+    fresh = build(tmp_path, 500, fast_path=fast_path)
+    np.testing.assert_array_equal(mask, fresh.generate_mandelbrot_set())
+    np.testing.assert_array_equal(refined.iterations, fresh.iterations)
+
+@pytest.mark.parametrize("window", PERTURBATION_WINDOWS)
+def test_perturbation_matches_fresh_render(window):
+    xrange, yrange, resolution = window
+    num = 200
+    center, dx, dy = delta_axes(xrange, yrange, resolution)
+    c = (float(center[0]) + dx)[np.newaxis, :] + ((float(center[1]) + dy)[:, np.newaxis] * 1j)
+    counts = perturbation_counts(xrange, yrange, resolution, num, THRESHOLD)
+    np.testing.assert_array_equal(counts == num, escape_time(c, num, THRESHOLD, False) == num)
+
+@pytest.mark.parametrize("fast_path", [False, True])
+def test_tiled_render_matches_fresh_render(fast_path):
+    real, imag = grid_axes(*WINDOW)
+    counts = render_tiled(*WINDOW, 200, THRESHOLD, fast_path, workers=2, tile_size=30)
+    np.testing.assert_array_equal(counts, escape_time(real[np.newaxis, :] + (imag[:, np.newaxis] * 1j), 200,
+                                                      THRESHOLD, fast_path))
+
+def test_streamed_render_matches_fresh_render(tmp_path):
+    path = build(tmp_path, 200).stream_to_disk(band_rows=7)
+    fresh = build(tmp_path, 200)
+    fresh.generate_mandelbrot_set()
+    np.testing.assert_array_equal(np.load(path), fresh.iterations)
@@ -0,0 +1,77 @@
+## Imports packages used in this module.
+import numpy as np
+import pytest
+from mandelbrot_engine import KERNELS, escape_time, grid_axes, select_precision
+
+## Iterations and escape radius shared by the tests.
+NUM = 200
+THRESHOLD = 2
+
+## Windows covering the whole set, the seahorse valley and the period-2 bulb's boundary.
+WINDOWS = [((-2.0, 1.0), (-1.5, 1.5), 60), ((-0.76, -0.72), (0.08, 0.12), 2000), ((-1.3, -0.7), (-0.3, 0.3), 200)]
+
+## Seahorse window whose boundary single precision gets wrong at this depth.
+DEEP_WINDOW = ((-0.76, -0.72), (0.08, 0.12), 5000)
+DEEP_NUM = 500
+
+## Computes the escape mask without any shortcut.
+def reference_mask(c, num, threshold):
+    """
+    Returns which points stay bounded, iterating every point num times.
+
+    Args:
+        c (np.array): The complex numbers to test.
+        num (int): The maximum number of iterations.
+        threshold (float): The escape radius.
+
+    Returns:
+        (np.array): True where the point never leaves the escape radius.
+    """
+    z = np.zeros_like(c)
+    bounded = np.ones(c.shape, dtype=bool)
+    for _ in range(num):
+        z[bounded] = (z[bounded] ** 2) + c[bounded]
+        bounded &= np.abs(z) <= threshold
+    return bounded
+
+## Builds the points of a test window.
+def window_points(xrange, yrange, resolution):
+    """
+    Returns the pixel grid of a window as complex numbers.
+
+    Args:
+        xrange (tuple): The range of the real numbers.
+        yrange (tuple): The range of the imaginary numbers.
+        resolution (int): The number of pixels per unit length.
+
+    Returns:
+        (np.array): One row per imaginary value.
+    """
+    real, imag = grid_axes(xrange, yrange, resolution)
+    return real[np.newaxis, :] + (imag[:, np.newaxis] * 1j)
+
+@pytest.mark.parametrize("backend", ["numpy", "inplace", "jit"])
+@pytest.mark.parametrize("fast_path", [False, True])
+@pytest.mark.parametrize("window", WINDOWS)
+def test_backend_matches_reference_mask(backend, fast_path, window):
+    if backend not in KERNELS:
+        pytest.skip(f"the {backend} backend is not available")
+    c = window_points(*window)
+    counts = escape_time(c, NUM, THRESHOLD, fast_path, backend)
+    assert counts.shape == c.shape
+    np.testing.assert_array_equal(counts == NUM, reference_mask(c, NUM, THRESHOLD))
+
+@pytest.mark.parametrize("backend", ["inplace", "jit"])
+def test_backend_counts_match_numpy(backend):
+    if backend not in KERNELS:
+        pytest.skip(f"the {backend} backend is not available")
+    c = window_points(*WINDOWS[0])
+    np.testing.assert_array_equal(escape_time(c, NUM, THRESHOLD, False, backend),
+                                  escape_time(c, NUM, THRESHOLD, False, "numpy"))
+
+def test_auto_precision_matches_double_mask():
+    c = window_points(*DEEP_WINDOW)
+    precision = select_precision(*DEEP_WINDOW, DEEP_NUM)
+    counts = escape_time(c, DEEP_NUM, THRESHOLD, precision=precision)
+    np.testing.assert_array_equal(counts == DEEP_NUM,
+                                  escape_time(c, DEEP_NUM, THRESHOLD, precision="double") == DEEP_NUM)
@@ -0,0 +1,356 @@
+## Imports packages used in this module.
+import argparse
+import asyncio
+import multiprocessing
+import sys
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+import numpy as np
+from image_writer import colormap_lut, encode_png
+from mandelbrot_engine import escape_time
+from render_cache import DEFAULT_CACHE_BYTES, RenderCache
+
+## Edge length of a tile in pixels.
+TILE_SIZE = 256
+
+## Center and width of the square that tile 0/0/0 covers.
+WORLD_CENTER = (-0.5, 0.0)
+WORLD_WIDTH = 4.0
+
+## Deepest zoom level served, beyond which float64 pixels stop being distinct.
+MAX_ZOOM = 40
+
+## Default size limit of the in-memory tile cache in bytes.
+DEFAULT_MEMORY_BYTES = 64 * 1024 ** 2
+
+## Default number of iterations at zoom level 0, and the number added per level.
+BASE_ITERATIONS = 128
+ITERATIONS_PER_ZOOM = 32
+
+## Computes the window a tile covers.
+def tile_axes(z, x, y, size=TILE_SIZE):
+    """
+    Returns the pixel centers of a slippy-map tile.
+
+    Tile 0/0/0 covers the square of WORLD_WIDTH around WORLD_CENTER. Every zoom
+    level splits each tile into four, with x growing to the right and y growing
+    downwards, so the first row of a tile has the largest imaginary value.
+
+    Args:
+        z (int): The zoom level.
+        x (int): The tile column.
+        y (int): The tile row.
+        size (int): The edge length of the tile in pixels.
+
+    Returns:
+        real (np.array): The real part of every pixel column.
+        imag (np.array): The imaginary part of every pixel row, from top to bottom.
+    """
+    span = WORLD_WIDTH / (2 ** z)
+    left = WORLD_CENTER[0] - (WORLD_WIDTH / 2) + (x * span)
+    top = WORLD_CENTER[1] + (WORLD_WIDTH / 2) - (y * span)
+    offsets = (np.arange(size) + 0.5) * (span / size)
+    return left + offsets, top - offsets
+
+## Renders one tile inside a worker process.
+def render_tile(z, x, y, num, cmap="binary", colored=False):
+    """
+    Returns a tile of the Mandelbrot Set encoded as PNG.
+
+    Args:
+        z (int): The zoom level.
+        x (int): The tile column.
+        y (int): The tile row.
+        num (int): The maximum number of iterations.
+        cmap (str): The name of the Matplotlib colormap.
+        colored (boolean): Whether iteration counts are colored instead of the binary mask.
+
+    Returns:
+        (bytes): The PNG file.
+    """
+    real, imag = tile_axes(z, x, y)
+    counts = escape_time(real[np.newaxis, :] + (imag[:, np.newaxis] * 1j), num, 2)
+    if colored is True:
+        lut = colormap_lut(cmap)
+        image = lut[(counts.astype(np.int64) * (len(lut) - 1)) // max(num, 1)]
+    else:
+        image = colormap_lut(cmap, 2)[(counts == num).view(np.uint8)]
+    return encode_png(image)
+
+## Represents a least recently used cache of tiles in memory.
+class MemoryTileCache():
+    """
+    A class that keeps encoded tiles in memory and drops the least recently
+    used ones once their total size passes a limit.
+
+    Attributes:
+        max_bytes (int): The size limit in bytes.
+        size (int): The total size of the cached tiles in bytes.
+        tiles (OrderedDict): The tiles by key, least recently used first.
+
+    Methods:
+        get(self, key): Returns a cached tile, or None.
+        put(self, key, data): Adds a tile and evicts old ones.
+
+    Usage:
+        This class is the first level of the tile server's cache.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MEMORY_BYTES):
+        """
+        Initializes the Memory Tile Cache.
+
+        Args:
+            max_bytes (int): The size limit in bytes.
+
+        Returns:
+            None
+        """
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.tiles = OrderedDict()
+
+    def get(self, key):
+        """
+        Returns a cached tile and marks it as recently used.
+
+        Args:
+            key (tuple): The tile key.
+
+        Returns:
+            (bytes): The tile, or None when it is not cached.
+        """
+        data = self.tiles.get(key)
+        if data is not None:
+            self.tiles.move_to_end(key)
+        return data
+
+    def put(self, key, data):
+        """
+        Adds a tile, evicting the least recently used tiles until the cache fits its limit.
+
+        Args:
+            key (tuple): The tile key.
+            data (bytes): The tile.
+
+        Returns:
+            None
+        """
+        if key in self.tiles:
+            self.size -= len(self.tiles.pop(key))
+        self.tiles[key] = data
+        self.size += len(data)
+        while self.size > self.max_bytes and self.tiles:
+            self.size -= len(self.tiles.popitem(last=False)[1])
+
+## Represents the tile server.
+class TileServer():
+    """
+    A class that serves z/x/y Mandelbrot tiles over HTTP on localhost. Requests
+    are answered by asyncio, tiles are rendered in a process pool, and finished
+    tiles are kept in memory and, optionally, in a RenderCache on disk.
+    Concurrent requests for a tile that is being rendered wait for the same
+    render instead of starting another.
+
+    Attributes:
+        host (str): The address the server listens on.
+        port (int): The port the server listens on.
+        workers (int): The number of render processes (all cores when None).
+        memory (MemoryTileCache): The in-memory tile cache.
+        disk (RenderCache): The on-disk tile cache, or None.
+        pending (dict): The renders in progress by tile key.
+        pool (ProcessPoolExecutor): The render processes while serving.
+
+    Methods:
+        get_tile(self, z, x, y, num, cmap, colored): Returns a tile, from a cache or rendered.
+        handle(self, reader, writer): Answers one HTTP connection.
+        serve(self): Runs the server until it is cancelled.
+
+    Usage:
+        This class is used by web viewers to browse the Mandelbrot Set tile by tile.
+    """
+
+    def __init__(self, host="127.0.0.1", port=8000, workers=None, cache_path=None,
+                 memory_bytes=DEFAULT_MEMORY_BYTES, cache_bytes=DEFAULT_CACHE_BYTES):
+        """
+        Initializes the Tile Server.
+
+        Args:
+            host (str): The address to listen on.
+            port (int): The port to listen on.
+            workers (int): The number of render processes (all cores when None).
+            cache_path (str): The directory of the on-disk tile cache, or None for memory only.
+            memory_bytes (int): The size limit of the in-memory cache in bytes.
+            cache_bytes (int): The size limit of the on-disk cache in bytes.
+
+        Returns:
+            None
+        """
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.memory = MemoryTileCache(memory_bytes)
+        self.disk = RenderCache(cache_path, cache_bytes) if cache_path is not None else None
+        self.pending = {}
+        self.pool = None
+
+    async def get_tile(self, z, x, y, num, cmap="binary", colored=False):
+        """
+        Returns a tile from memory, from disk, or by rendering it in the process pool.
+
+        Args:
+            z (int): The zoom level.
+            x (int): The tile column.
+            y (int): The tile row.
+            num (int): The maximum number of iterations.
+            cmap (str): The name of the Matplotlib colormap.
+            colored (boolean): Whether iteration counts are colored instead of the binary mask.
+
+        Returns:
+            (bytes): The PNG file.
+        """
+        key = (z, x, y, num, cmap, colored)
+        data = self.memory.get(key)
+        if data is not None:
+            return data
+        task = self.pending.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._load_tile(key))
+            self.pending[key] = task
+            task.add_done_callback(lambda _: self.pending.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _load_tile(self, key):
+        """
+        Loads a tile from disk or renders it, and stores it in both caches.
+
+        Args:
+            key (tuple): The zoom level, column, row, iterations, colormap and coloring of the tile.
+
+        Returns:
+            (bytes): The PNG file.
+        """
+        loop = asyncio.get_running_loop()
+        params = dict(zip(("z", "x", "y", "num", "cmap", "colored"), key))
+        data = None
+        if self.disk is not None:
+            data = await loop.run_in_executor(None, self.disk.load_bytes, "MandelbrotTile.png", params)
+        if data is None:
+            data = await loop.run_in_executor(self.pool, render_tile, *key)
+            if self.disk is not None:
+                await loop.run_in_executor(None, self.disk.save_bytes, "MandelbrotTile.png", params, data)
+        self.memory.put(key, data)
+        return data
+
+    async def _respond(self, writer, status, content_type, body):
+        """
+        Writes one HTTP response and closes the connection.
+
+        Args:
+            writer (asyncio.StreamWriter): The connection.
+            status (str): The status code and reason, for example "200 OK".
+            content_type (str): The MIME type of the body.
+            body (bytes): The response body.
+
+        Returns:
+            None
+        """
+        headers = (f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\nContent-Length: {len(body)}\r\n"
+                   "Cache-Control: max-age=86400\r\nAccess-Control-Allow-Origin: *\r\nConnection: close\r\n\r\n")
+        writer.write(headers.encode("ascii") + body)
+        await writer.drain()
+        writer.close()
+
+    async def handle(self, reader, writer):
+        """
+        Answers one HTTP connection. Tiles are served at /z/x/y.png, with optional
+        num, cmap and colored query parameters.
+
+        Args:
+            reader (asyncio.StreamReader): The request stream.
+            writer (asyncio.StreamWriter): The response stream.
+
+        Returns:
+            None
+        """
+        try:
+            request = await reader.readuntil(b"\r\n\r\n")
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            writer.close()
+            return
+        parts = request.split(b"\r\n", 1)[0].decode("latin-1").split(" ")
+        if len(parts) != 3 or parts[0] != "GET":
+            await self._respond(writer, "405 Method Not Allowed", "text/plain", b"Only GET is supported.\n")
+            return
+
+        url = urlsplit(parts[1])
+        path = url.path.strip("/").split("/")
+        query = parse_qs(url.query)
+        try:
+            if len(path) != 3 or not path[2].endswith(".png"):
+                raise ValueError
+            z, x, y = int(path[0]), int(path[1]), int(path[2][:-4])
+            num = int(query.get("num", [BASE_ITERATIONS + (ITERATIONS_PER_ZOOM * z)])[0])
+            cmap = query.get("cmap", ["binary"])[0]
+            colored = query.get("colored", ["0"])[0] in ("1", "true")
+            if not (0 <= z <= MAX_ZOOM and 0 <= x < 2 ** z and 0 <= y < 2 ** z and num > 0):
+                raise ValueError
+            colormap_lut(cmap, 2)
+        except (ValueError, KeyError):
+            await self._respond(writer, "404 Not Found", "text/plain", b"Tiles are served at /z/x/y.png.\n")
+            return
+
+        try:
+            data = await self.get_tile(z, x, y, num, cmap, colored)
+        except Exception as error:
+            await self._respond(writer, "500 Internal Server Error", "text/plain", f"{error}\n".encode("utf-8"))
+            return
+        await self._respond(writer, "200 OK", "image/png", data)
+
+    async def serve(self):
+        """
+        Starts the process pool and serves requests until cancelled.
+
+        The render processes are spawned rather than forked, so they never
+        inherit the sockets of open connections, which would keep those
+        connections from closing.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            self.pool = pool
+            server = await asyncio.start_server(self.handle, self.host, self.port)
+            async with server:
+                print(f"Serving Mandelbrot tiles at http://{self.host}:{self.port}/{{z}}/{{x}}/{{y}}.png")
+                await server.serve_forever()
+
+## The tile server command line.
+def main(argv=None):
+    """
+    Runs the tile server command line.
+
+    Args:
+        argv (list): The command-line arguments, sys.argv when None.
+
+    Returns:
+        (int): The exit status.
+    """
+    parser = argparse.ArgumentParser(description="Serve Mandelbrot tiles on localhost.")
+    parser.add_argument("-p", "--port", type=int, default=8000, help="The port to listen on.")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="The number of render processes.")
+    parser.add_argument("-c", "--cache", default=None, help="A directory that keeps rendered tiles across runs.")
+    args = parser.parse_args(argv)
+
+    try:
+        asyncio.run(TileServer(port=args.port, workers=args.workers, cache_path=args.cache).serve())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
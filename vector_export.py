@@ -0,0 +1,487 @@
+## Imports packages used in this module.
+import struct
+import numpy as np
+from geometry_stream import DEFAULT_CHUNK_SIZE
+
+## Default length of the longer side of an exported drawing in pixels.
+DEFAULT_EXPORT_SIZE = 1024
+
+## Default size in pixels below which primitives are not subdivided.
+DEFAULT_MIN_SIZE = 1.0
+
+## Number of SVG coordinate steps per pixel.
+SVG_SUBPIXELS = 10
+
+## Room kept for the attributes of the SVG root element, which are written once the bounds are known.
+SVG_ROOT_WIDTH = 160
+
+## Fraction of the first primitive's size down to which the bounds are estimated before exporting.
+PREVIEW_DETAIL = 1 / 64
+
+## Binary vertex format: the file header, and the header of every chunk.
+VERTEX_MAGIC = b"FRVX"
+VERTEX_HEADER = struct.Struct("<4sB3xQQ4d")
+VERTEX_CHUNK = struct.Struct("<II")
+
+## Primitive kinds of the binary vertex format.
+POLYLINES = 1
+TRIANGLES = 2
+
+## Joins segments into polylines.
+def merge_segments(segments, quantum):
+    """
+    Returns the polylines formed by consecutive segments that share an end point, without their straight joints.
+
+    Points are compared on a grid of the given spacing. A segment that starts
+    where the previous one ended continues its polyline, and a vertex whose
+    neighbours lie on one straight line with it, or that repeats the previous
+    vertex, is dropped. The comparison is exact on the integer grid, so
+    dropping vertices never bends a line.
+
+    Args:
+        segments (np.array): An (n, 2, 2) array of segment start and end points in drawing order.
+        quantum (float): The grid spacing, for example a tenth of an output pixel.
+
+    Returns:
+        vertices (np.array): A (v, 2) array of the vertices of all polylines, one polyline after another.
+        lengths (np.array): The number of vertices of every polyline.
+    """
+    if len(segments) == 0:
+        return np.empty((0, 2)), np.empty(0, dtype=np.int64)
+    grid = np.rint(segments / quantum).astype(np.int64)
+    starts = np.ones(len(segments), dtype=bool)
+    starts[1:] = np.any(grid[1:, 0] != grid[:-1, 1], axis=1)
+    ends = np.append(starts[1:], True)
+
+    # Every segment adds its start point, and the last segment of a polyline adds its end point too.
+    counts = 1 + ends
+    offsets = np.cumsum(counts) - counts
+    vertices = np.empty((counts.sum(), 2))
+    points = np.empty((counts.sum(), 2), dtype=np.int64)
+    vertices[offsets] = segments[:, 0]
+    points[offsets] = grid[:, 0]
+    vertices[offsets[ends] + 1] = segments[ends, 1]
+    points[offsets[ends] + 1] = grid[ends, 1]
+
+    first = np.zeros(len(points), dtype=bool)
+    first[offsets[starts]] = True
+    last = np.zeros(len(points), dtype=bool)
+    last[offsets[ends] + 1] = True
+    before = points[1:-1] - points[:-2]
+    after = points[2:] - points[1:-1]
+    straight = np.zeros(len(points), dtype=bool)
+    straight[1:-1] = (((before[:, 0] * after[:, 1]) - (before[:, 1] * after[:, 0])) == 0) & \
+                     (np.sum(before * after, axis=1) > 0)
+    repeated = np.zeros(len(points), dtype=bool)
+    repeated[1:] = np.all(points[1:] == points[:-1], axis=1)
+    keep = first | last | ~(straight | repeated)
+    lengths = np.bincount((np.cumsum(first) - 1)[keep], minlength=int(starts.sum()))
+    return vertices[keep], lengths
+
+## Formats SVG path data.
+def path_data(grid, lengths):
+    """
+    Returns the path data that draws polylines given in whole coordinate steps.
+
+    Every polyline is a moveto followed by its remaining points, which SVG
+    reads as linetos. The numbers are formatted with array arithmetic, one
+    digit column at a time, rather than one string per number.
+
+    Args:
+        grid (np.array): A (v, 2) integer array of the vertices of all polylines.
+        lengths (np.array): The number of vertices of every polyline.
+
+    Returns:
+        (bytes): The value of the d attribute.
+    """
+    values = grid.ravel()
+    magnitude = np.abs(values)
+    digits = len(str(int(magnitude.max()))) if len(values) > 0 else 1
+    width = digits + 2
+
+    # Each number takes a row of a separator, an optional sign and its digits, right aligned.
+    text = np.full((len(values), width), ord(" "), dtype=np.uint8)
+    count = np.ones(len(values), dtype=np.int64)
+    for place in range(digits):
+        text[:, width - 1 - place] = ord("0") + ((magnitude // (10 ** place)) % 10)
+        if place > 0:
+            count += magnitude >= (10 ** place)
+    keep = np.arange(width) >= (width - count[:, np.newaxis])
+    keep[:, 0] = True
+    negative = np.nonzero(values < 0)[0]
+    text[negative, width - count[negative] - 1] = ord("-")
+    keep[negative, width - count[negative] - 1] = True
+    text[2 * (np.cumsum(lengths) - lengths), 0] = ord("M")
+    return text[keep].tobytes()
+
+## Streams polylines and triangles into an SVG file.
+class SVGWriter():
+    """
+    A class that writes an SVG file one chunk of primitives at a time, with
+    one path element per chunk. Coordinates are whole steps of a tenth of a
+    pixel, and the size of the drawing is filled into the root element when
+    the file is closed.
+
+    Attributes:
+        origin (np.array): The world coordinates of the top left corner of the pixel grid.
+        scale (float): The number of coordinate steps per world unit.
+        filled (boolean): Whether primitives are filled rather than stroked.
+        low (np.array): The smallest coordinates written so far.
+        high (np.array): The largest coordinates written so far.
+        root_offset (int): The position of the root element in the file.
+        file (file): The open output file.
+
+    Methods:
+        write_polylines(self, vertices, lengths): Appends polylines to the drawing.
+        write_triangles(self, triangles): Appends filled triangles to the drawing.
+        close(self): Writes the size of the drawing and closes the SVG file.
+
+    Usage:
+        This class is used to export fractal geometry as vector graphics without Matplotlib figures.
+    """
+
+    def __init__(self, path, origin, scale, filled=False):
+        """
+        Opens the SVG file and writes its header.
+
+        Args:
+            path (str): The SVG file to write.
+            origin (tuple): The world coordinates of the top left corner of the drawing.
+            scale (float): The number of pixels per world unit.
+            filled (boolean): Whether primitives are filled rather than stroked.
+
+        Returns:
+            None
+        """
+        self.origin = np.asarray(origin, dtype=float)
+        self.scale = scale * SVG_SUBPIXELS
+        self.filled = filled
+        self.low = np.full(2, np.iinfo(np.int64).max)
+        self.high = np.full(2, np.iinfo(np.int64).min)
+        self.file = open(path, "wb")
+        self.file.write(b'<?xml version="1.0" encoding="UTF-8"?>\n')
+        self.root_offset = self.file.tell()
+        self.file.write(self._root(b""))
+        if filled is True:
+            style = 'fill="black" stroke="none"'
+        else:
+            style = f'fill="none" stroke="black" stroke-width="{SVG_SUBPIXELS}" stroke-linejoin="round"'
+        self.file.write(f"<g {style}>\n".encode("ascii"))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _root(self, attributes):
+        """
+        Returns the root element, padded to a fixed length so it can be rewritten in place.
+
+        Args:
+            attributes (bytes): The size attributes of the drawing.
+
+        Returns:
+            (bytes): The opening svg tag.
+        """
+        return b'<svg xmlns="http://www.w3.org/2000/svg" ' + attributes.ljust(SVG_ROOT_WIDTH) + b">\n"
+
+    def _grid(self, points):
+        """
+        Returns points as whole coordinate steps, with y growing downwards, and tracks their bounds.
+
+        Args:
+            points (np.array): A (v, 2) array of world coordinates.
+
+        Returns:
+            (np.array): A (v, 2) integer array of SVG coordinates.
+        """
+        grid = np.empty((len(points), 2), dtype=np.int64)
+        grid[:, 0] = np.rint((points[:, 0] - self.origin[0]) * self.scale)
+        grid[:, 1] = np.rint((self.origin[1] - points[:, 1]) * self.scale)
+        if len(grid) > 0:
+            self.low = np.minimum(self.low, grid.min(axis=0))
+            self.high = np.maximum(self.high, grid.max(axis=0))
+        return grid
+
+    def write_polylines(self, vertices, lengths):
+        """
+        Appends polylines to the drawing as one path.
+
+        Args:
+            vertices (np.array): A (v, 2) array of the vertices of all polylines.
+            lengths (np.array): The number of vertices of every polyline.
+
+        Returns:
+            None
+        """
+        if len(vertices) == 0:
+            return
+        self.file.write(b'<path d="' + path_data(self._grid(vertices), lengths) + b'"/>\n')
+
+    def write_triangles(self, triangles):
+        """
+        Appends filled triangles to the drawing as one path.
+
+        Args:
+            triangles (np.array): An (n, 3, 2) array of triangle vertices.
+
+        Returns:
+            None
+        """
+        if len(triangles) == 0:
+            return
+        # Filling closes every subpath, so a triangle needs no closepath.
+        lengths = np.full(len(triangles), 3)
+        self.file.write(b'<path d="' + path_data(self._grid(triangles.reshape(-1, 2)), lengths) + b'"/>\n')
+
+    def close(self):
+        """
+        Closes the drawing and writes its bounds into the root element.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        if self.file.closed:
+            return
+        self.file.write(b"</g>\n</svg>\n")
+        if self.high[0] < self.low[0]:
+            low, size = np.zeros(2, dtype=np.int64), np.zeros(2, dtype=np.int64)
+        else:
+            # Strokes reach half their width past the end points.
+            margin = 0 if self.filled is True else SVG_SUBPIXELS // 2
+            low, size = self.low - margin, (self.high - self.low) + (2 * margin)
+        attributes = (f'width="{size[0] / SVG_SUBPIXELS:g}" height="{size[1] / SVG_SUBPIXELS:g}" '
+                      f'viewBox="{low[0]} {low[1]} {size[0]} {size[1]}"')
+        self.file.seek(self.root_offset)
+        self.file.write(self._root(attributes.encode("ascii")))
+        self.file.close()
+
+## Streams polylines and triangles into a binary vertex file.
+class VertexWriter():
+    """
+    A class that writes geometry as little-endian float32 vertices, one chunk
+    at a time. The file starts with a header of the magic FRVX, the primitive
+    kind, the primitive and vertex counts and the bounds (xmin, ymin, xmax,
+    ymax as float64), which is filled in when the file is closed. Every chunk
+    is its primitive and vertex counts as uint32, the uint32 vertex count of
+    every polyline (polyline files only), and then the vertices as x, y pairs.
+
+    Attributes:
+        kind (int): POLYLINES or TRIANGLES.
+        primitives (int): The number of primitives written so far.
+        vertices (int): The number of vertices written so far.
+        low (np.array): The smallest coordinates written so far.
+        high (np.array): The largest coordinates written so far.
+        file (file): The open output file.
+
+    Methods:
+        write_polylines(self, vertices, lengths): Appends polylines to the file.
+        write_triangles(self, triangles): Appends triangles to the file.
+        close(self): Writes the header and closes the file.
+
+    Usage:
+        This class is used to hand fractal geometry to other programs, such as GPU viewers.
+    """
+
+    def __init__(self, path, kind):
+        """
+        Opens the vertex file and reserves its header.
+
+        Args:
+            path (str): The file to write.
+            kind (int): POLYLINES or TRIANGLES.
+
+        Returns:
+            None
+        """
+        self.kind = kind
+        self.primitives = 0
+        self.vertices = 0
+        self.low = np.full(2, np.inf)
+        self.high = np.full(2, -np.inf)
+        self.file = open(path, "wb")
+        self.file.write(VERTEX_HEADER.pack(VERTEX_MAGIC, kind, 0, 0, 0.0, 0.0, 0.0, 0.0))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _write_chunk(self, points, lengths=None):
+        """
+        Writes one chunk of vertices and tracks the counts and bounds.
+
+        Args:
+            points (np.array): A (v, 2) array of vertices.
+            lengths (np.array): The number of vertices of every polyline, or None for triangles.
+
+        Returns:
+            None
+        """
+        primitives = len(lengths) if lengths is not None else len(points) // 3
+        self.file.write(VERTEX_CHUNK.pack(primitives, len(points)))
+        if lengths is not None:
+            self.file.write(np.asarray(lengths, dtype="<u4").tobytes())
+        self.file.write(np.asarray(points, dtype="<f4").tobytes())
+        self.primitives += primitives
+        self.vertices += len(points)
+        self.low = np.minimum(self.low, points.min(axis=0))
+        self.high = np.maximum(self.high, points.max(axis=0))
+
+    def write_polylines(self, vertices, lengths):
+        """
+        Appends polylines to the file.
+
+        Args:
+            vertices (np.array): A (v, 2) array of the vertices of all polylines.
+            lengths (np.array): The number of vertices of every polyline.
+
+        Returns:
+            None
+        """
+        if len(vertices) > 0:
+            self._write_chunk(vertices, lengths)
+
+    def write_triangles(self, triangles):
+        """
+        Appends triangles to the file.
+
+        Args:
+            triangles (np.array): An (n, 3, 2) array of triangle vertices.
+
+        Returns:
+            None
+        """
+        if len(triangles) > 0:
+            self._write_chunk(triangles.reshape(-1, 2))
+
+    def close(self):
+        """
+        Writes the counts and bounds into the header and closes the file.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        if self.file.closed:
+            return
+        bounds = np.concatenate((self.low, self.high)) if self.vertices > 0 else np.zeros(4)
+        self.file.seek(0)
+        self.file.write(VERTEX_HEADER.pack(VERTEX_MAGIC, self.kind, self.primitives, self.vertices, *bounds))
+        self.file.close()
+
+## Reads a binary vertex file.
+def read_vertices(path):
+    """
+    Returns the contents of a file written by VertexWriter.
+
+    Args:
+        path (str): The vertex file.
+
+    Returns:
+        kind (int): POLYLINES or TRIANGLES.
+        bounds (tuple): The smallest x and y and the largest x and y.
+        vertices (np.array): A (v, 2) float32 array of all vertices.
+        lengths (np.array): The number of vertices of every primitive.
+    """
+    with open(path, "rb") as file:
+        data = file.read()
+    magic, kind, primitives, count, *bounds = VERTEX_HEADER.unpack_from(data)
+    if magic != VERTEX_MAGIC:
+        raise ValueError(f"{path} is not a vertex file.")
+    vertices = []
+    lengths = []
+    offset = VERTEX_HEADER.size
+    while offset < len(data):
+        chunk_primitives, chunk_vertices = VERTEX_CHUNK.unpack_from(data, offset)
+        offset += VERTEX_CHUNK.size
+        if kind == POLYLINES:
+            lengths.append(np.frombuffer(data, dtype="<u4", count=chunk_primitives, offset=offset))
+            offset += 4 * chunk_primitives
+        else:
+            lengths.append(np.full(chunk_primitives, 3, dtype=np.uint32))
+        vertices.append(np.frombuffer(data, dtype="<f4", count=2 * chunk_vertices, offset=offset).reshape(-1, 2))
+        offset += 8 * chunk_vertices
+    vertices = np.concatenate(vertices) if vertices else np.empty((0, 2), dtype=np.float32)
+    lengths = np.concatenate(lengths) if lengths else np.empty(0, dtype=np.uint32)
+    return kind, tuple(bounds), vertices, lengths
+
+## Returns the chunked geometry of a fractal.
+def _geometry_iterator(fractal):
+    """
+    Returns the method that streams the primitives of a canopy, Koch curve or Sierpinski triangle.
+
+    Args:
+        fractal (object): A FractalCanopy, KochCurve or SierpinskiTriangle.
+
+    Returns:
+        (function): Yields chunks of primitives given a chunk size and a minimum size.
+    """
+    if hasattr(fractal, "iter_branches"):
+        return fractal.iter_branches
+    if hasattr(fractal, "iter_segments"):
+        return fractal.iter_segments
+    return fractal.iter_triangles
+
+## Exports a fractal as vector geometry.
+def export_vector(fractal, path, size=DEFAULT_EXPORT_SIZE, min_size=DEFAULT_MIN_SIZE, chunk_size=DEFAULT_CHUNK_SIZE,
+                  metrics=None):
+    """
+    Writes the geometry of a fractal to an SVG file, or to a binary vertex file for any other extension.
+
+    The drawing is scaled so its longer side is size pixels, and primitives
+    are not subdivided once they are smaller than min_size pixels, so the
+    file grows with the visible detail rather than with the number of
+    iterations. Segments are merged into polylines with merge_segments. The
+    geometry is streamed in chunks and never held in memory at once.
+
+    Args:
+        fractal (object): A FractalCanopy, KochCurve or SierpinskiTriangle.
+        path (str): The SVG or vertex file to write.
+        size (int): The length of the longer side of the drawing in pixels.
+        min_size (float): The size in pixels below which primitives are not subdivided, 0 to keep every primitive.
+        chunk_size (int): The largest number of primitives handled at once.
+        metrics (RenderMetrics): Receives the number of primitives and written vertices, or None.
+
+    Returns:
+        path (str): The written file.
+    """
+    primitives = _geometry_iterator(fractal)
+    filled = primitives.__name__ == "iter_triangles"
+
+    # The scale comes from the bounds of a coarse pass, which are within a few percent of the final ones.
+    first = next(primitives(1, np.inf), None)
+    extent = float(np.max(np.ptp(first.reshape(-1, 2), axis=0))) if first is not None else 0.0
+    low = np.full(2, np.inf)
+    high = np.full(2, -np.inf)
+    for chunk in primitives(chunk_size, extent * PREVIEW_DETAIL):
+        low = np.minimum(low, chunk.reshape(-1, 2).min(axis=0))
+        high = np.maximum(high, chunk.reshape(-1, 2).max(axis=0))
+    span = float(np.max(high - low)) if np.all(high >= low) else 0.0
+    scale = size / span if span > 0 else 1.0
+    origin = (low[0], high[1]) if span > 0 else (0.0, 0.0)
+
+    if path.lower().endswith(".svg"):
+        writer = SVGWriter(path, origin, scale, filled)
+    else:
+        writer = VertexWriter(path, TRIANGLES if filled else POLYLINES)
+    with writer:
+        for chunk in primitives(chunk_size, min_size / scale):
+            if filled:
+                writer.write_triangles(chunk)
+                written = 3 * len(chunk)
+            else:
+                vertices, lengths = merge_segments(chunk, 1 / (scale * SVG_SUBPIXELS))
+                writer.write_polylines(vertices, lengths)
+                written = len(vertices)
+            if metrics is not None:
+                metrics.count("primitives", len(chunk))
+                metrics.count("vertices", written)
+    return path